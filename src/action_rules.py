@@ -0,0 +1,141 @@
+import json
+import os
+import re
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "action_rules.json")
+
+# 超過這個長度的動作通常包含多個步驟，一律交給 GM 判定
+MAX_LOCAL_ACTION_LENGTH = 30
+
+VERDICTS = ("no_roll", "reject", "escalate")
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+# 展開佔位符後編譯的規則快取上限；名稱集合隨世界與玩家狀態改變
+_DYNAMIC_CACHE_SIZE = 256
+
+
+def _skill_names(world):
+    names = set(world.skills)
+    for skill, info in world.skill_tree.items():
+        names.add(skill)
+        names.add(info["next"])
+    return names
+
+
+def _all_abilities(world):
+    return {item["ability"] for item in world.items.values() if "ability" in item}
+
+
+def placeholder_values(player, world):
+    """
+    規則表中可引用的名稱集合。
+    {skill} 世界中所有技能、{unlearned_skill} 玩家尚未學會的技能、
+    {ability} 所有物品能力、{missing_ability} 玩家目前沒有裝備的能力。
+    """
+    skills = _skill_names(world)
+    abilities = _all_abilities(world)
+    return {
+        "skill": skills,
+        "unlearned_skill": skills - set(player.skills),
+        "ability": abilities,
+        "missing_ability": abilities - set(player.get_active_abilities(world)),
+    }
+
+
+class RuleTable:
+    """
+    以關鍵字/正規表示式規則在本地判定動作。
+
+    規則依序比對，第一條符合的規則決定結果：
+    "no_roll" 合理且不需擲骰、"reject" 直接駁回、"escalate" 交給 GM 判定。
+    沒有任何規則符合時同樣交給 GM。
+    不含佔位符的規則在建立時就編譯好；含佔位符的規則依展開時使用的名稱集合快取編譯結果。
+    """
+
+    def __init__(self, rules):
+        for rule in rules:
+            if rule.get("verdict") not in VERDICTS:
+                raise ValueError(f"無效的規則判定：{rule.get('verdict')}（規則：{rule.get('name')}）")
+            if not rule.get("patterns"):
+                raise ValueError(f"規則缺少 patterns：{rule.get('name')}")
+        self.rules = rules
+        # 每條規則的 [(模式字串, 編譯結果或 None, 佔位符名稱)]；None 表示需要依名稱集合展開
+        self._patterns = []
+        for rule in rules:
+            compiled = []
+            for pattern in rule["patterns"]:
+                names = tuple(sorted(set(_PLACEHOLDER.findall(pattern))))
+                compiled.append((pattern, None if names else re.compile(pattern), names))
+            self._patterns.append(compiled)
+        self._dynamic = {}
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _compile(self, pattern, values):
+        """將規則中的佔位符展開成名稱的選擇群組；名稱集合為空時展開為永不符合的 (?!)。"""
+        def expand(match):
+            names = values.get(match.group(1))
+            if names is None:
+                raise ValueError(f"未知的規則佔位符：{match.group(0)}")
+            if not names:
+                return "(?!)"
+            return "(?:" + "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True)) + ")"
+
+        return re.compile(_PLACEHOLDER.sub(expand, pattern))
+
+    def _compile_cached(self, pattern, names, values):
+        key = (pattern,) + tuple(frozenset(values.get(name, ())) for name in names)
+        compiled = self._dynamic.get(key)
+        if compiled is None:
+            if len(self._dynamic) >= _DYNAMIC_CACHE_SIZE:
+                self._dynamic.clear()
+            compiled = self._dynamic[key] = self._compile(pattern, values)
+        return compiled
+
+    def __call__(self, action, player, world):
+        values = None
+        for rule, patterns in zip(self.rules, self._patterns):
+            for pattern, compiled, names in patterns:
+                if compiled is None:
+                    if values is None:
+                        values = placeholder_values(player, world)
+                    compiled = self._compile_cached(pattern, names, values)
+                match = compiled.search(action)
+                if match:
+                    reason = rule.get("reason", "").format(**match.groupdict())
+                    return rule["verdict"], reason
+        return None
+
+
+class ActionClassifier:
+    """
+    在呼叫 GM 之前的本地判定階段。
+
+    stages 是依序執行的判定函式，簽名為 (action, player, world)，
+    回傳 (verdict, reason) 或 None；第一個給出結論的階段決定結果。
+    """
+
+    def __init__(self, stages=None):
+        self.stages = stages if stages is not None else [RuleTable.from_file()]
+
+    def classify(self, action, player, world):
+        """
+        回傳與 Narrator.evaluate_action 相同格式的結果，需要交給 GM 判定時回傳 None。
+        """
+        action = action.strip()
+        if not action or len(action) > MAX_LOCAL_ACTION_LENGTH:
+            return None
+        for stage in self.stages:
+            decision = stage(action, player, world)
+            if decision is None:
+                continue
+            verdict, reason = decision
+            if verdict == "no_roll":
+                return True, reason, False, 0, 0
+            if verdict == "reject":
+                return False, reason, False, 0, 0
+            return None
+        return None
@@ -0,0 +1,186 @@
+import asyncio
+import re
+import threading
+
+# 每回合最多預先生成的地點數
+PREFETCH_PER_TURN = 2
+# 整場遊戲預先生成的地點總數上限，None 表示不限
+PREFETCH_TOTAL = 50
+# 同時進行的預先生成請求數
+PREFETCH_CONCURRENCY = 2
+
+# 敘述中看起來像地點名稱的詞：跟在移動相關的動詞之後、以地點類詞結尾
+_PLACE_PATTERN = re.compile(
+    r"(?:前往|抵達|回到|走進|進入|來到|通往|到|去|往)"
+    r"([^\s，。、！？：；「」（）]{1,8}?"
+    r"(?:車站|捷運站|機場|港口|碼頭|老街|夜市|市場|廣場|公園|大樓|大廈|神社|寺|廟|宮|"
+    r"森林|山脈|湖|遺跡|學院|大學|醫院|酒吧|咖啡廳|圖書館|博物館|地下道|基地|城|鎮|村))"
+)
+
+
+class AsyncNarrator:
+    """
+    以 asyncio 包裝 Narrator，方法與 Narrator 一一對應。
+
+    底層 SDK 呼叫在執行緒中進行；共用同一個對話的方法以鎖依序執行，
+    判定與地點描述不經過對話，可以並行。
+    """
+
+    def __init__(self, narrator):
+        self.narrator = narrator
+        self._chat_lock = asyncio.Lock()
+
+    async def _chat_call(self, method, *args, **kwargs):
+        async with self._chat_lock:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def describe_scene(self, player, world):
+        return await self._chat_call(self.narrator.describe_scene, player, world)
+
+    async def generate_location_description(self, location_name, world=None):
+        return await asyncio.to_thread(self.narrator.generate_location_description, location_name, world)
+
+    async def fetch_location_description(self, location_name):
+        return await asyncio.to_thread(self.narrator.fetch_location_description, location_name)
+
+    async def evaluate_action(self, action, player, world):
+        return await asyncio.to_thread(self.narrator.evaluate_action, action, player, world)
+
+    async def resolve_action(self, action, player, world):
+        return await self._chat_call(self.narrator.resolve_action, action, player, world)
+
+    async def choose_branch(self, branches, key):
+        return await self._chat_call(self.narrator.choose_branch, branches, key)
+
+    async def get_no_roll_outcome(self, action, player, world, on_text=None):
+        return await self._chat_call(self.narrator.get_no_roll_outcome, action, player, world, on_text=on_text)
+
+    async def narrate_outcome(self, action, dice_roll, is_success, player, world, on_text=None):
+        return await self._chat_call(
+            self.narrator.narrate_outcome, action, dice_roll, is_success, player, world, on_text=on_text
+        )
+
+    async def generate_improvised_character(self, player, world):
+        return await self._chat_call(self.narrator.generate_improvised_character, player, world)
+
+
+def mentioned_locations(text, world, current_location=None):
+    """
+    從敘述中找出可能前往的地點：已知地點的名稱，以及看起來像地點的詞。
+    """
+    found = []
+    for name in world.locations:
+        if name in text:
+            found.append(name)
+    for match in _PLACE_PATTERN.finditer(text):
+        found.append(match.group(1))
+
+    candidates = []
+    for name in found:
+        if name != current_location and name not in candidates:
+            candidates.append(name)
+    return candidates
+
+
+class PrefetchScheduler:
+    """
+    在玩家輸入時，於背景預先生成敘述中提到的地點描述，暖好地點快取。
+
+    背景事件迴圈在獨立執行緒中執行；生成的描述先暫存，
+    由主執行緒呼叫 drain 時才寫入 World.locations，避免與遊戲迴圈同時修改世界。
+    cancel 會撤銷尚未送出的請求並退回額度，已送出的請求完成後仍會保留結果。
+    """
+
+    def __init__(self, narrator, per_turn=PREFETCH_PER_TURN, total=PREFETCH_TOTAL,
+                 concurrency=PREFETCH_CONCURRENCY):
+        self.narrator = AsyncNarrator(narrator)
+        self.location_cache = narrator.location_cache
+        self.per_turn = per_turn
+        self.total = total
+        self.concurrency = concurrency
+        self.requested = 0
+        self._lock = threading.Lock()
+        self._ready = {}
+        self._pending = {}
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def schedule(self, text, player, world):
+        """根據最新的敘述排程預先生成，回傳這次排入的地點。"""
+        scheduled = []
+        for name in mentioned_locations(text, world, player.location):
+            if len(scheduled) >= self.per_turn:
+                break
+            with self._lock:
+                if self.total is not None and self.requested >= self.total:
+                    break
+                if name in self._pending or name in self._ready:
+                    continue
+                if self.location_cache.get(name, world) is not None:
+                    continue
+                self.requested += 1
+                state = {"started": False, "cancelled": False}
+                self._pending[name] = state
+            asyncio.run_coroutine_threadsafe(self._prefetch(name, state), self._loop)
+            scheduled.append(name)
+        return scheduled
+
+    async def _prefetch(self, name, state):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            with self._lock:
+                if state["cancelled"]:
+                    return
+                state["started"] = True
+            try:
+                description = await self.narrator.fetch_location_description(name)
+            except Exception as e:
+                print(f"【錯誤】預先生成地點 {name} 時發生錯誤：{e}")
+                with self._lock:
+                    self._pending.pop(name, None)
+                return
+        with self._lock:
+            self._pending.pop(name, None)
+            self._ready[name] = description
+
+    def cancel(self):
+        """撤銷尚未送出的預先生成請求，回傳被撤銷的地點。"""
+        cancelled = []
+        with self._lock:
+            for name, state in list(self._pending.items()):
+                if not state["started"]:
+                    state["cancelled"] = True
+                    self.requested -= 1
+                    del self._pending[name]
+                    cancelled.append(name)
+        return cancelled
+
+    def drain(self, world):
+        """將已完成的描述寫入地點快取，必須在主執行緒呼叫。"""
+        with self._lock:
+            ready, self._ready = self._ready, {}
+        for name, description in ready.items():
+            self.location_cache.put(name, description, world)
+        return list(ready)
+
+    def close(self):
+        """停止背景事件迴圈，仍在進行中的請求結果會被捨棄。"""
+        self.cancel()
+
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=1)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
+        if not self._thread.is_alive():
+            self._loop.close()
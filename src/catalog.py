@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from types import MappingProxyType
+
+import schemas
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# 編譯後的目錄快取；暖啟動時檔案沒有變動就直接讀取，不必重新解析與驗證 JSON
+CACHE_FILE = os.path.join(DATA_DIR, "__pycache__", "catalog.pickle")
+# 快取格式或結構定義改變時遞增，讓舊的快取失效
+CACHE_VERSION = 1
+
+KINDS = ("races", "skill_tree", "skills", "miracles", "items")
+SLOTS = ("weapon", "head", "torso", "arms", "legs", "feet", "accessory")
+
+_STRING = {"type": "string"}
+_COST = {"type": "integer", "minimum": 0}
+
+
+def _table(entry):
+    """{名稱: 定義} 形式的檔案。"""
+    return {"type": "object", "additionalProperties": entry}
+
+
+def _entry(properties, required):
+    return {"type": "object", "properties": properties, "required": required, "additionalProperties": False}
+
+
+SCHEMAS = {
+    "races": _table(_entry(
+        {"description": _STRING, "skills": {"type": "array", "items": _STRING}},
+        ["description", "skills"])),
+    "skill_tree": _table(_entry({"next": _STRING, "cost": _COST}, ["next", "cost"])),
+    "skills": _table(_entry({"cost": _COST, "description": _STRING}, ["cost", "description"])),
+    "miracles": _table(_entry({"deity": _STRING, "description": _STRING}, ["deity", "description"])),
+    "items": _table(_entry({
+        "type": _STRING,
+        "description": _STRING,
+        "slot": {"type": "string", "enum": list(SLOTS)},
+        "bonus": _table({"type": "integer"}),
+        "effect": {"type": "object"},
+        "faith_effect": _table({"type": "integer"}),
+        "corruption_effect": {"type": "integer"},
+        "ability": _STRING,
+        "passive": _table({"type": "integer"}),
+        "curse": _STRING,
+    }, ["type", "description"])),
+}
+
+
+def freeze(value):
+    """遞迴地將字典轉成唯讀映射、列表轉成 tuple。"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Catalog:
+    """
+    一份已驗證、整個行程共用的唯讀內建目錄。
+    各類定義以屬性或 catalog["items"] 取得；stamps 記錄載入時來源檔案的 (mtime, 大小)。
+    """
+
+    def __init__(self, data, directories=(), stamps=None):
+        self.directories = tuple(directories)
+        self.stamps = stamps or {}
+        for kind in KINDS:
+            setattr(self, kind, freeze(data[kind]))
+        # 技能樹的反向索引：{進化後技能: 進化前技能}
+        self.skill_parent = MappingProxyType({info["next"]: skill for skill, info in self.skill_tree.items()})
+
+    def __getitem__(self, kind):
+        if kind not in KINDS:
+            raise KeyError(kind)
+        return getattr(self, kind)
+
+
+def source_files(directories):
+    """
+    依載入順序列出各資料夾中的目錄檔案（<種類>.json）。
+    第一個資料夾是基本內容，必須包含所有種類；之後的內容包只需要提供要新增或覆寫的種類。
+    """
+    files = []
+    for index, directory in enumerate(directories):
+        for kind in KINDS:
+            path = os.path.join(directory, f"{kind}.json")
+            if os.path.exists(path):
+                files.append((kind, path))
+            elif index == 0:
+                raise ValueError(f"找不到目錄檔案：{path}")
+    return files
+
+
+def _stamps(files):
+    stamps = {}
+    for _, path in files:
+        stat = os.stat(path)
+        stamps[path] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def _digest(content):
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def validate_catalog(data):
+    """檢查各檔案之間的關聯，回傳錯誤訊息列表。"""
+    errors = []
+    parents = {}
+    for skill, info in data["skill_tree"].items():
+        if info["next"] in parents:
+            errors.append(f"技能樹中「{info['next']}」有多個進化來源：{parents[info['next']]}、{skill}")
+        parents[info["next"]] = skill
+    for skill in data["skill_tree"]:
+        seen = {skill}
+        current = data["skill_tree"][skill]["next"]
+        while current in data["skill_tree"]:
+            if current in seen:
+                errors.append(f"技能樹中「{skill}」的進化鏈形成循環")
+                break
+            seen.add(current)
+            current = data["skill_tree"][current]["next"]
+    return errors
+
+
+def parse_files(files):
+    """讀取、驗證並合併目錄檔案，回傳 (合併後的資料, {路徑: 雜湊值})；內容無效時拋出 ValueError。"""
+    data = {kind: {} for kind in KINDS}
+    digests = {}
+    errors = []
+    for kind, path in files:
+        with open(path, 'rb') as f:
+            content = f.read()
+        digests[path] = _digest(content)
+        try:
+            table = json.loads(content.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            errors.append(f"{path}：不是有效的 JSON：{e}")
+            continue
+        file_errors = schemas.validate(table, SCHEMAS[kind], kind)
+        if file_errors:
+            errors.extend(f"{path}：{error}" for error in file_errors)
+            continue
+        data[kind].update(table)
+    if not errors:
+        errors = validate_catalog(data)
+    if errors:
+        raise ValueError("目錄檔案無效：\n" + "\n".join(errors))
+    return data, digests
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(cache_file, files, stamps, digests, data):
+    record = {"version": CACHE_VERSION, "files": files, "stamps": stamps, "digests": digests, "data": data}
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temp_path = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_file)
+    except OSError:
+        # 資料夾無法寫入時只是少了快取，不影響遊戲
+        pass
+
+
+def load(directories=None, cache_file=CACHE_FILE):
+    """
+    載入目錄並回傳 Catalog。
+
+    來源檔案的 (mtime, 大小) 與快取相同時直接使用快取；不同時比對內容雜湊，
+    內容沒有變化（例如只是被 touch）就更新快取的時間戳記，否則重新解析並驗證。
+    cache_file 為 None 時不使用快取。
+    """
+    directories = list(directories or [DATA_DIR])
+    files = source_files(directories)
+    stamps = _stamps(files)
+    cached = _read_cache(cache_file) if cache_file else None
+
+    if cached is not None and cached["files"] == files:
+        if cached["stamps"] == stamps:
+            return Catalog(cached["data"], directories, stamps)
+        digests = {}
+        for _, path in files:
+            with open(path, 'rb') as f:
+                digests[path] = _digest(f.read())
+        if digests == cached["digests"]:
+            _write_cache(cache_file, files, stamps, digests, cached["data"])
+            return Catalog(cached["data"], directories, stamps)
+
+    data, digests = parse_files(files)
+    if cache_file:
+        _write_cache(cache_file, files, stamps, digests, data)
+    return Catalog(data, directories, stamps)
+
+
+_lock = threading.Lock()
+_current = None
+_pack_dirs = []
+_failed_stamps = None
+
+
+def current():
+    """目前使用中的目錄，第一次呼叫時載入。"""
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                _current = load([DATA_DIR] + _pack_dirs, CACHE_FILE)
+    return _current
+
+
+def use_packs(pack_dirs):
+    """設定要疊加在基本內容之上的內容包資料夾，並立即重新載入。"""
+    global _pack_dirs
+    _pack_dirs = list(pack_dirs)
+    return reload(force=True)
+
+
+def reload(force=False):
+    """
+    來源檔案有變動時重新載入目錄，回傳是否換成了新的目錄。
+    新內容無效時保留目前的目錄並顯示錯誤；同一份無效內容只回報一次。
+    已經建立的 World 會在下次呼叫 World.refresh_catalog 時改用新的目錄。
+    """
+    global _current, _failed_stamps
+    with _lock:
+        directories = [DATA_DIR] + _pack_dirs
+        try:
+            files = source_files(directories)
+            stamps = _stamps(files)
+        except (OSError, ValueError) as e:
+            print(f"【錯誤】無法重新載入遊戲內容：{e}")
+            return False
+        if not force and _current is not None and stamps == _current.stamps:
+            return False
+        if not force and stamps == _failed_stamps:
+            return False
+        try:
+            catalog = load(directories, CACHE_FILE)
+        except (OSError, ValueError) as e:
+            _failed_stamps = stamps
+            print(f"【錯誤】無法重新載入遊戲內容，繼續使用目前的內容：{e}")
+            return False
+        _failed_stamps = None
+        _current = catalog
+        return True
@@ -0,0 +1,87 @@
+import random
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為選用套件，沒有時批次擲骰退回純 Python
+    np = None
+
+SIDES = 20
+# 根據 AGENTS.md，最多5顆骰子
+MAX_DICE = 5
+
+
+def clamp_dice(num_dice):
+    return max(1, min(num_dice, MAX_DICE))
+
+
+@lru_cache(maxsize=None)
+def distribution(num_dice, sides=SIDES):
+    """
+    num_dice 顆 sides 面骰總和的精確分布，以逐顆卷積計算。
+    回傳 tuple，索引為總和、值為出現的組合數；總組合數為 sides ** num_dice。
+    """
+    counts = [1]
+    for _ in range(num_dice):
+        convolved = [0] * (len(counts) + sides)
+        for total, count in enumerate(counts):
+            if count:
+                for face in range(1, sides + 1):
+                    convolved[total + face] += count
+        counts = convolved
+    return tuple(counts)
+
+
+def success_probability(num_dice, target, sides=SIDES):
+    """總和大於等於 target 的精確機率。"""
+    num_dice = clamp_dice(num_dice)
+    counts = distribution(num_dice, sides)
+    hits = sum(counts[max(target, 0):])
+    return hits / sides ** num_dice
+
+
+def probability_table(sides=SIDES):
+    """1 到 MAX_DICE 顆骰子、每個目標值的成功機率：{顆數: {目標值: 機率}}。"""
+    table = {}
+    for num_dice in range(1, MAX_DICE + 1):
+        table[num_dice] = {target: success_probability(num_dice, target, sides)
+                           for target in range(num_dice, num_dice * sides + 1)}
+    return table
+
+
+class DiceEngine:
+    """
+    擲骰引擎。每個遊戲階段擁有自己的亂數流，給定 seed 時結果可重現，
+    方便測試與重播。roll_batch 用於大量模擬，安裝 numpy 時以向量化方式進行。
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._np_rng = None
+
+    def roll(self, num_dice=1, sides=SIDES):
+        num_dice = clamp_dice(num_dice)
+        return [self.rng.randint(1, sides) for _ in range(num_dice)]
+
+    def _numpy_rng(self):
+        if self._np_rng is None:
+            # 由本引擎的亂數流衍生，使批次結果同樣可重現
+            self._np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        return self._np_rng
+
+    def roll_batch(self, num_dice, trials, sides=SIDES):
+        """一次擲 trials 回合，回傳每回合的總和（有 numpy 時為陣列）。"""
+        num_dice = clamp_dice(num_dice)
+        if np is not None:
+            rolls = self._numpy_rng().integers(1, sides + 1, size=(trials, num_dice))
+            return rolls.sum(axis=1)
+        randint = self.rng.randint
+        return [sum(randint(1, sides) for _ in range(num_dice)) for _ in range(trials)]
+
+    def estimate_success(self, num_dice, target, trials=100000, sides=SIDES):
+        """以蒙地卡羅模擬估計成功機率，用於校正與比對精確分布。"""
+        totals = self.roll_batch(num_dice, trials, sides)
+        if np is not None:
+            return float((totals >= target).mean())
+        return sum(1 for total in totals if total >= target) / trials
@@ -1,59 +1,63 @@
+import action_rules
+import dice
 import narrator
 import player
+import save_engine
+import tracing
 import world
-import json
-import os
-import random
 
-SAVE_FILE = "savegame.json"
+SAVE_ENGINE = save_engine.SaveEngine()
+# 存檔的寫入都交給背景執行緒，遊戲迴圈不等待磁碟
+SAVE_WORKER = save_engine.AutosaveWorker(SAVE_ENGINE)
+# 每回合結束時自動存檔
+AUTOSAVE = True
+# 串流模式：敘述文字一到達就逐段顯示，不必等待完整回應
+STREAM_NARRATION = True
+# 本地判定階段：簡單的移動、對話與明顯不合理的動作不必等待 GM 判定
+LOCAL_CLASSIFIER = action_rules.ActionClassifier()
+# handle_action 的 classifier 預設值；明確傳入 None 表示略過本地判定
+_DEFAULT_CLASSIFIER = object()
+# 單次呼叫模式：判定與成功/失敗敘述一次取得，擲骰後在本地選擇分支
+SINGLE_CALL_RESOLUTION = False
+# 玩家輸入時，於背景預先生成敘述中提到的地點描述
+PREFETCH_LOCATIONS = True
+# 預設的擲骰亂數流；伺服器的每個連線各自擁有一個
+DICE = dice.DiceEngine()
+# 擲骰前顯示成功機率
+SHOW_ODDS = True
+# 結構化回應模式：判定與敘述以 JSON 回傳並在本地驗證（需要支援 JSON 模式的模型）
+STRUCTURED_RESPONSES = False
 
 def save_game(p, w, n):
     """
     儲存遊戲狀態，包含玩家、世界和 AI 對話歷史。
+    只有自上次存檔後改變的部分會被附加到存檔中。寫入成功時回傳 True。
     """
-    # 將 Gemini 的對話歷史轉換為可序列化的格式
-    serializable_history = []
-    for content in n.chat.history:
-        serializable_history.append({
-            "role": content.role,
-            "parts": [part.text for part in content.parts]
-        })
-
-    save_data = {
-        "player": p.__dict__,
-        "world": {
-            "locations": w.locations,
-            "items": w.items
-        },
-        "narrator_history": serializable_history
-    }
-    with open(SAVE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(save_data, f, ensure_ascii=False, indent=4)
-    print(f"\n【系統】遊戲已儲存至 {SAVE_FILE}。")
-
-def load_game():
+    SAVE_WORKER.submit(p, w, n)
+    if not SAVE_WORKER.flush():
+        print("\n【錯誤】遊戲儲存失敗，下次存檔時會重新寫入完整的存檔。")
+        return False
+    print(f"\n【系統】遊戲已儲存至 {SAVE_ENGINE.path}。")
+    return True
+
+def load_game(narrator_factory=None, engine=None):
     """
     讀取遊戲狀態，回傳重建後的物件。
+    narrator_factory 用來建立敘事者（預設為 new_narrator），engine 預設為 SAVE_ENGINE。
     """
-    if not os.path.exists(SAVE_FILE):
+    engine = engine or SAVE_ENGINE
+    if not engine.exists():
         return None, None, None
 
-    with open(SAVE_FILE, 'r', encoding='utf-8') as f:
-        save_data = json.load(f)
-
     p = player.Player()
     w = world.World()
-    n = narrator.Narrator()
-
-    # 恢復玩家和世界狀態
-    p.__dict__.update(save_data['player'])
-    w.locations = save_data['world']['locations']
-    w.items = save_data['world']['items']
+    n = (narrator_factory or new_narrator)()
 
-    # 恢復 AI 對話歷史
-    n.chat = n.model.start_chat(history=save_data['narrator_history'])
+    # 恢復玩家、世界狀態與 AI 對話歷史
+    if not engine.load_into(p, w, n):
+        return None, None, None
 
-    print(f"\n【系統】已從 {SAVE_FILE} 讀取存檔。歡迎回來，{p.name}！")
+    print(f"\n【系統】已讀取存檔。歡迎回來，{p.name}！")
     return p, w, n
 
 def start_game():
@@ -61,16 +65,23 @@ def start_game():
     開始新遊戲。
     """
     p, w, n = None, None, None
+    autosave = AUTOSAVE
 
     # 遊戲模式選擇
     print("歡迎來到這個世界！")
-    if os.path.exists(SAVE_FILE):
+    if SAVE_ENGINE.exists():
         print("1. 🚀 開始新遊戲")
         print("2. 📂 讀取存檔")
         mode_choice = ""
         while mode_choice not in ['1', '2']:
             mode_choice = input("請輸入你的選擇 (1/2): ")
             if mode_choice == '1':
+                if AUTOSAVE:
+                    # 新遊戲的第一次自動存檔會取代現有的存檔
+                    confirm = input("【系統】自動存檔會覆蓋現有的存檔，要開啟自動存檔嗎？(是/否) ").lower()
+                    autosave = confirm in ['是', 'y', 'yes']
+                    if not autosave:
+                        print("【系統】自動存檔已關閉，輸入「存檔」時才會覆蓋現有的存檔。")
                 p, w, n = new_game_setup()
             elif mode_choice == '2':
                 p, w, n = load_game()
@@ -81,6 +92,12 @@ def start_game():
         print("【錯誤】遊戲初始化失敗，無法開始。")
         return
 
+    prefetcher = None
+    if PREFETCH_LOCATIONS:
+        # asyncio 的匯入較慢，等角色設定完成後才載入
+        import async_narrator
+        prefetcher = async_narrator.PrefetchScheduler(n)
+
     # 遊戲主循環
     while True:
         # 如果玩家沒有地點，設定一個初始地點 (僅限新遊戲)
@@ -91,19 +108,31 @@ def start_game():
             # 敘事者描述場景
             scene_description = n.describe_scene(p, w)
             print(scene_description)
+            if prefetcher:
+                prefetcher.schedule(scene_description, p, w)
         
-        # 獲取玩家輸入
+        # 獲取玩家輸入（此時背景可能正在預先生成地點描述）
         action = input("\n> ")
+        if prefetcher:
+            prefetcher.cancel()
+            with tracing.span("prefetch.drain"):
+                prefetcher.drain(w)
         action_parts = action.lower().split()
         command = action_parts[0] if action_parts else ""
 
         # 檢查特殊指令
         if command in ['存檔', 'save']:
-            save_game(p, w, n)
+            if save_game(p, w, n):
+                # 存檔已經屬於這個遊戲，之後可以照常自動存檔
+                autosave = AUTOSAVE
             continue
         elif command in ['離開', 'quit', 'exit']:
-            confirm = input("確定要離開遊戲嗎？未儲存的進度將會遺失。(是/否) ").lower()
+            if autosave:
+                confirm = input("確定要離開遊戲嗎？進度已自動儲存到上一回合結束。(是/否) ").lower()
+            else:
+                confirm = input("確定要離開遊戲嗎？未儲存的進度將會遺失。(是/否) ").lower()
             if confirm in ['是', 'y', 'yes']:
+                SAVE_WORKER.flush()
                 print("下次再會！")
                 break
             else:
@@ -131,75 +160,114 @@ def start_game():
             continue
 
         # 處理玩家動作
-        result, gp_awarded, faith_change, corruption_change, item_received, new_item_def, skill_received, new_skill_def, miracle_received, new_miracle_def = handle_action(action, p, w, n)
-        print(result)
-
-        # 處理新創建的物品
-        if new_item_def and item_received:
-            w.add_item_definition(item_received, new_item_def)
-
-        # 處理新創建的技能
-        if new_skill_def and skill_received:
-            w.add_skill_definition(skill_received, new_skill_def)
+        streamed = []
+        def on_text(text):
+            streamed.append(text)
+            print(text, end="", flush=True)
+
+        with tracing.span("turn", action_chars=len(action)):
+            with tracing.span("handle_action"):
+                outcome = handle_action(action, p, w, n, on_text=on_text if STREAM_NARRATION else None)
+            result = outcome[0]
+            if streamed:
+                print()
+            else:
+                print(result)
+            if prefetcher:
+                prefetcher.schedule(result, p, w)
 
-        # 處理新創建的奇蹟
-        if new_miracle_def and miracle_received:
-            w.add_miracle_definition(miracle_received, new_miracle_def)
+            with tracing.span("apply_action_result"):
+                apply_action_result(outcome, p, w)
 
-        # 處理成長點數
-        if gp_awarded > 0:
-            p.growth_points += gp_awarded
-            print(f"\n【系統】你獲得了 {gp_awarded} 點成長點數 (GP)！你現在共有 {p.growth_points} GP。")
-
-        # 處理信仰變化
-        if faith_change:
-            deity, change = faith_change
-            p.faith[deity] = p.faith.get(deity, 0) + change
-            if change > 0:
-                print(f"【系統】你對 {deity} 的信仰加深了 {change}。")
-            else:
-                print(f"【系統】你對 {deity} 的信仰動搖了 {-change}。")
-            # 自動設定主要信仰
-            if not p.deity or p.faith.get(p.deity, 0) < p.faith[deity]:
-                p.deity = deity
-                print(f"【系統】{deity} 已成為你的主要信仰。")
-
-        # 處理腐化變化
-        if corruption_change > 0:
-            p.corruption += corruption_change
-            print(f"【系統】你的腐化值增加了 {corruption_change}。你現在的腐化值是 {p.corruption}。")
-
-        # 處理獲得物品
-        if item_received:
-            p.add_item(item_received)
-
-        # 處理獲得技能
-        if skill_received:
-            if skill_received not in p.skills:
-                p.skills.append(skill_received)
-                print(f"【系統】你學會了新的技能：{skill_received}！")
-
-        # 處理獲得奇蹟
-        if miracle_received:
-            if miracle_received not in p.miracles:
-                p.miracles.append(miracle_received)
-                print(f"【系統】你領悟了新的奇蹟：{miracle_received}！")
-
-        # --- 回合結束階段 ---
-        end_of_turn_effects(p, w)
+            # --- 回合結束階段 ---
+            with tracing.span("end_of_turn"):
+                end_of_turn_effects(p, w)
+            if autosave:
+                with tracing.span("autosave.submit"):
+                    SAVE_WORKER.submit(p, w, n)
 
         # 檢查遊戲是否結束
         if is_game_over(p, w):
             print("\n--- 遊戲結束 ---")
             p.show_status(w)
+            SAVE_WORKER.flush()
             break
 
+def apply_action_result(outcome, p, w):
+    """
+    將 handle_action 回傳的結果套用到玩家與世界：新的定義、成長點數、信仰、腐化與獲得的東西。
+    """
+    result, gp_awarded, faith_change, corruption_change, item_received, new_item_def, skill_received, new_skill_def, miracle_received, new_miracle_def = outcome
+
+    # 處理新創建的物品
+    if new_item_def and item_received:
+        with tracing.span("world.add_definition", kind="item"):
+            w.add_item_definition(item_received, new_item_def)
+
+    # 處理新創建的技能
+    if new_skill_def and skill_received:
+        with tracing.span("world.add_definition", kind="skill"):
+            w.add_skill_definition(skill_received, new_skill_def)
+
+    # 處理新創建的奇蹟
+    if new_miracle_def and miracle_received:
+        with tracing.span("world.add_definition", kind="miracle"):
+            w.add_miracle_definition(miracle_received, new_miracle_def)
+
+    # 處理成長點數
+    if gp_awarded > 0:
+        p.growth_points += gp_awarded
+        print(f"\n【系統】你獲得了 {gp_awarded} 點成長點數 (GP)！你現在共有 {p.growth_points} GP。")
+
+    # 處理信仰變化
+    if faith_change:
+        deity, change = faith_change
+        p.faith[deity] = p.faith.get(deity, 0) + change
+        if change > 0:
+            print(f"【系統】你對 {deity} 的信仰加深了 {change}。")
+        else:
+            print(f"【系統】你對 {deity} 的信仰動搖了 {-change}。")
+        # 自動設定主要信仰
+        if not p.deity or p.faith.get(p.deity, 0) < p.faith[deity]:
+            p.deity = deity
+            print(f"【系統】{deity} 已成為你的主要信仰。")
+
+    # 處理腐化變化
+    if corruption_change > 0:
+        p.corruption += corruption_change
+        print(f"【系統】你的腐化值增加了 {corruption_change}。你現在的腐化值是 {p.corruption}。")
+
+    # 處理獲得物品
+    if item_received:
+        p.add_item(item_received)
+
+    # 處理獲得技能
+    if skill_received:
+        if skill_received not in p.skills:
+            p.skills.append(skill_received)
+            print(f"【系統】你學會了新的技能：{skill_received}！")
+
+    # 處理獲得奇蹟
+    if miracle_received:
+        if miracle_received not in p.miracles:
+            p.miracles.append(miracle_received)
+            print(f"【系統】你領悟了新的奇蹟：{miracle_received}！")
+
+def new_narrator():
+    """
+    依目前的設定建立敘事者。SDK 在背景執行緒中預先載入，
+    玩家設定角色的同時完成準備，不會延遲第一個提示。
+    """
+    n = narrator.Narrator(structured=STRUCTURED_RESPONSES)
+    n.warm_up()
+    return n
+
 def new_game_setup():
     """
     執行新遊戲的標準設定流程。
     """
     w = world.World()
-    n = narrator.Narrator()
+    n = new_narrator()
     p = player.Player()
 
     print("\n1. ✏️ 角色創建 (詳細設定你的角色)")
@@ -216,21 +284,43 @@ def new_game_setup():
             print("無效的選擇，請重新輸入。")
     return p, w, n
 
-def handle_action(action, p, w, n):
+def handle_action(action, p, w, n, on_text=None, classifier=_DEFAULT_CLASSIFIER, dice_engine=None):
     """
     處理玩家的動作。
+    提供 on_text 時，敘述會以串流方式逐段交給 on_text。
+    classifier 為本地判定階段，預設使用 LOCAL_CLASSIFIER，傳入 None 時一律交給敘事者判定。
+    dice_engine 為這個遊戲階段的擲骰引擎，預設使用 DICE。
     """
-    # 由敘事者判斷動作是否合理，以及是否需要擲骰
-    is_valid, reason, needs_roll, num_dice, target = n.evaluate_action(action, p, w)
+    if classifier is _DEFAULT_CLASSIFIER:
+        classifier = LOCAL_CLASSIFIER
+    with tracing.span("classify") as span:
+        verdict = classifier.classify(action, p, w) if classifier else None
+        span.set(local=verdict is not None)
+    branches = None
+    if verdict is None:
+        with tracing.span("judge"):
+            if SINGLE_CALL_RESOLUTION:
+                # 判定與成功/失敗敘述在同一次呼叫中取得
+                *verdict, branches = n.resolve_action(action, p, w)
+            else:
+                # 由敘事者判斷動作是否合理，以及是否需要擲骰
+                verdict = n.evaluate_action(action, p, w)
+    is_valid, reason, needs_roll, num_dice, target = verdict
     if not is_valid:
         return reason, 0, None, 0, None, None, None, None, None, None
 
     # 如果不需要擲骰，直接獲取結果
     if not needs_roll:
-        return n.get_no_roll_outcome(action, p, w)
+        with tracing.span("narrate", roll=False):
+            if branches:
+                return n.choose_branch(branches, "result")
+            return n.get_no_roll_outcome(action, p, w, on_text=on_text)
 
     # 擲骰子
-    dice_roll = roll_dice(num_dice)
+    if SHOW_ODDS:
+        odds = dice.success_probability(num_dice, target)
+        print(f"【系統】成功機率約 {odds:.0%}。")
+    dice_roll = roll_dice(num_dice, engine=dice_engine)
     print(f"【系統】你擲出了 {num_dice}d20，結果是：{dice_roll} (目標值: {target}) ")
     
     total_roll = sum(dice_roll)
@@ -242,16 +332,17 @@ def handle_action(action, p, w, n):
         print("【系統】失敗！")
 
     # 由敘事者根據擲骰結果和動作決定結果
-    return n.narrate_outcome(action, dice_roll, is_success, p, w)
+    with tracing.span("narrate", roll=True, success=is_success):
+        if branches:
+            return n.choose_branch(branches, "success" if is_success else "failure")
+        return n.narrate_outcome(action, dice_roll, is_success, p, w, on_text=on_text)
 
 
-def roll_dice(num_dice=1, sides=20):
+def roll_dice(num_dice=1, sides=20, engine=None):
     """
-    擲骰子。
+    擲骰子。骰子數量限制在 1 到 dice.MAX_DICE 顆。
     """
-    # 根據 AGENTS.md，最多5顆骰子
-    num_dice = max(1, min(num_dice, 5))
-    return [random.randint(1, sides) for _ in range(num_dice)]
+    return (engine or DICE).roll(num_dice, sides)
 
 def is_game_over(p, w):
     """
@@ -265,32 +356,15 @@ def is_game_over(p, w):
 
 def end_of_turn_effects(p, w):
     """
-    處理回合結束時的增益/減益效果。
+    推進世界時間並處理回合結束時的增益/減益效果。
+    效果以到期回合排程，只有這回合到期的效果會被處理。
     """
-    effects_to_remove = []
-    for attr, effects in p.active_effects.items():
-        for item_name, details in effects.items():
-            details["duration"] -= 1
-            if details["duration"] <= 0:
-                effects_to_remove.append((attr, item_name))
-    
-    for attr, item_name in effects_to_remove:
-        del p.active_effects[attr][item_name]
-        # 如果某个属性的所有效果都没了，就移除该属性的键
-        if not p.active_effects[attr]:
-            del p.active_effects[attr]
+    w.time += 1
+    for attr, item_name in p.pop_expired_effects(w.time):
         print(f"【系統】來自 {item_name} 的效果已結束。")
 
     # 處理裝備的被動效果
-    for slot, item_name in p.equipment.items():
-        if not item_name:
-            continue
-        item = w.items.get(item_name)
-        if not item:
-            continue
-        passive = item.get("passive")
-        if not passive:
-            continue
+    for item_name, passive in p.get_equipment_aggregate(w)["passives"]:
         if "heal" in passive:
             p.heal(passive["heal"], w)
         if "corruption" in passive:
@@ -0,0 +1,144 @@
+import re
+
+# 對話歷史預算：超過任一上限時，較舊的回合會被壓縮成前情提要
+DEFAULT_MAX_TURNS = 20
+DEFAULT_MAX_TOKENS = 6000
+DEFAULT_KEEP_TURNS = 6
+SUMMARY_MAX_CHARS = 1200
+
+SUMMARY_MARKER = "[前情提要]"
+_SUMMARY_ACK = "了解，我會延續這段劇情。"
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?])")
+_CJK = re.compile(r"[　-鿿＀-￯]")
+_GAIN_PREFIXES = ("獲得物品:", "獲得技能:", "獲得奇蹟:")
+
+
+def estimate_tokens(text):
+    """
+    粗略估算文字的 token 數：中日文字元約一字一個 token，其餘約四個字元一個 token。
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def content_text(content):
+    """取出一筆對話紀錄的文字，支援 Gemini 的 Content 物件與 dict。"""
+    if isinstance(content, dict):
+        parts = content.get("parts", [])
+    else:
+        parts = content.parts
+    texts = []
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            texts.append(part.get("text", ""))
+        else:
+            texts.append(part.text)
+    return "".join(texts)
+
+
+def content_role(content):
+    if isinstance(content, dict):
+        return content.get("role", "user")
+    return content.role
+
+
+def to_serializable(history):
+    """將對話歷史轉換為可寫入 JSON 的格式。"""
+    return [
+        {"role": content_role(content), "parts": [content_text(content)]}
+        for content in history
+    ]
+
+
+def extract_summary(turns_text):
+    """
+    本地摘要：從每則 GM 回應中擷取敘述的第一句與獲得的物品/技能/奇蹟。
+    """
+    notes = []
+    for text in turns_text:
+        narrative = ""
+        gains = []
+        for line in text.strip().split("\n"):
+            line = line.strip()
+            if line.startswith("敘述:"):
+                narrative = line.split(":", 1)[1].strip()
+            elif line.startswith(_GAIN_PREFIXES):
+                gains.append(line)
+        if not narrative:
+            narrative = text.strip().split("\n")[0].strip()
+        sentence = _SENTENCE_END.split(narrative, 1)[0][:80]
+        if gains:
+            sentence += f"（{'，'.join(gains)}）"
+        if sentence:
+            notes.append(sentence)
+    return " ".join(notes)
+
+
+class HistoryManager:
+    """
+    管理敘事者的對話歷史，讓每回合送出的內容維持在固定預算內。
+
+    超過回合數或 token 上限時，保留最近 keep_turns 個回合，
+    較舊的回合會被合併進滾動的前情提要，並以一組對話放在歷史最前面。
+    summarizer 可替換成呼叫模型的摘要函式，預設使用本地擷取式摘要。
+    """
+
+    def __init__(self, max_turns=DEFAULT_MAX_TURNS, max_tokens=DEFAULT_MAX_TOKENS,
+                 keep_turns=DEFAULT_KEEP_TURNS, summarizer=None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.keep_turns = min(keep_turns, max_turns)
+        self.summarizer = summarizer
+        self.summary = ""
+        self.compactions = 0
+
+    def _split_summary(self, history):
+        """將歷史分成前情提要與一般對話兩部分。"""
+        history = list(history)
+        if history and content_text(history[0]).startswith(SUMMARY_MARKER):
+            return history[:2], history[2:]
+        return [], history
+
+    def needs_compaction(self, history):
+        _, turns = self._split_summary(history)
+        if len(turns) > self.max_turns * 2:
+            return True
+        tokens = sum(estimate_tokens(content_text(c)) for c in history)
+        return tokens > self.max_tokens and len(turns) > self.keep_turns * 2
+
+    def compact(self, history):
+        """
+        壓縮對話歷史，回傳新的歷史列表（可直接傳給 start_chat）。
+        """
+        _, turns = self._split_summary(history)
+        split = max(len(turns) - self.keep_turns * 2, 0)
+        old, recent = turns[:split], turns[split:]
+
+        replies = [content_text(c) for c in old if content_role(c) == "model"]
+        if self.summarizer:
+            try:
+                self.summary = self.summarizer(self.summary, replies)
+            except Exception as e:
+                print(f"【錯誤】摘要對話歷史時發生錯誤：{e}，改用本地摘要。")
+                self.summary = self._merge(extract_summary(replies))
+        else:
+            self.summary = self._merge(extract_summary(replies))
+        self.compactions += 1
+        return self.summary_entries() + to_serializable(recent)
+
+    def _merge(self, new_notes):
+        summary = f"{self.summary} {new_notes}".strip()
+        # 只保留最新的部分，讓前情提要長度固定
+        return summary[-SUMMARY_MAX_CHARS:]
+
+    def summary_entries(self):
+        """以一組對話的形式回傳前情提要，沒有摘要時回傳空列表。"""
+        if not self.summary:
+            return []
+        return [
+            {"role": "user", "parts": [f"{SUMMARY_MARKER} {self.summary}"]},
+            {"role": "model", "parts": [_SUMMARY_ACK]},
+        ]
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+
+import save_engine
+
+# 磁碟快取與存檔放在同一個資料夾；每行一筆 {"key": ..., "description": ...}
+LOCATION_CACHE_FILE = os.path.join(os.path.dirname(save_engine.SAVE_FILE), "location_cache.jsonl")
+# 記憶體中（World.locations）保留的地點數量
+MEMORY_CAPACITY = 64
+# 磁碟快取保留的地點數量
+DISK_CAPACITY = 1000
+
+
+def cache_key(location_name, context=""):
+    """
+    地點描述的內容鍵：只由影響描述內容的輸入（世界觀設定與地點名稱）決定，
+    因此不同的遊戲可以共用，也不會因為遊戲中新增定義而失效。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(context.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(location_name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LocationCache:
+    """
+    地點描述的快取。
+
+    記憶體層就是 World.locations（依插入順序實作 LRU，會隨存檔一起保存），
+    未命中時再查詢跨遊戲共用的磁碟快取，兩者都沒有才需要呼叫 API。
+    只有與玩家無關的描述才能放進磁碟快取；依玩家狀態生成的場景以 shared=False 只存在這場遊戲中。
+    磁碟快取以 cache_key 為鍵，新的描述以附加一行的方式寫入，
+    行數超過容量的兩倍時才重寫成只包含最近的 disk_capacity 筆。
+    """
+
+    def __init__(self, path=LOCATION_CACHE_FILE, memory_capacity=MEMORY_CAPACITY,
+                 disk_capacity=DISK_CAPACITY, context=""):
+        self.path = path
+        self.memory_capacity = memory_capacity
+        self.disk_capacity = disk_capacity
+        self.context = context
+        self._disk = None
+        self._lines = 0
+
+    def _load_disk(self):
+        if self._disk is None:
+            self._disk = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            self._lines += 1
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                # 寫到一半中斷的紀錄，略過
+                                continue
+                            self._disk.pop(entry["key"], None)
+                            self._disk[entry["key"]] = entry["description"]
+                except OSError as e:
+                    print(f"【錯誤】讀取地點快取時發生錯誤：{e}")
+        return self._disk
+
+    def _append_disk(self, key, description):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "description": description}, ensure_ascii=False) + "\n")
+            self._lines += 1
+        except OSError as e:
+            print(f"【錯誤】寫入地點快取時發生錯誤：{e}")
+
+    def _compact_disk(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, description in self._disk.items():
+                    f.write(json.dumps({"key": key, "description": description}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._lines = len(self._disk)
+        except OSError as e:
+            print(f"【錯誤】寫入地點快取時發生錯誤：{e}")
+
+    def get(self, location_name, world, shared=True):
+        """回傳快取的描述，沒有快取時回傳 None；shared 為 False 時不查詢磁碟快取。"""
+        entry = world.locations.get(location_name)
+        if entry:
+            # 移到最後，標記為最近使用
+            world.locations[location_name] = world.locations.pop(location_name)
+            return entry["description"]
+        if not shared:
+            return None
+
+        description = self._load_disk().get(cache_key(location_name, self.context))
+        if description is not None:
+            self._remember(location_name, description, world)
+        return description
+
+    def put(self, location_name, description, world, shared=True):
+        """記住描述；shared 為 False 時只存入 World.locations，不寫入跨遊戲共用的磁碟快取。"""
+        self._remember(location_name, description, world)
+        if not shared:
+            return
+
+        disk = self._load_disk()
+        key = cache_key(location_name, self.context)
+        disk.pop(key, None)
+        disk[key] = description
+        while len(disk) > self.disk_capacity:
+            del disk[next(iter(disk))]
+        self._append_disk(key, description)
+        if self.path and self._lines > 2 * self.disk_capacity:
+            self._compact_disk()
+
+    def _remember(self, location_name, description, world):
+        world.locations.pop(location_name, None)
+        world.locations[location_name] = {"description": description}
+        while len(world.locations) > self.memory_capacity:
+            del world.locations[next(iter(world.locations))]
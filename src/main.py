@@ -1,11 +1,29 @@
+import argparse
+
 import game
+import tracing
 
 def main():
     """
     遊戲的主要進入點。
     """
+    parser = argparse.ArgumentParser(description="RPG 遊戲")
+    parser.add_argument("--profile", action="store_true", help="結束時顯示各處理階段的耗時統計")
+    parser.add_argument("--trace", metavar="PATH", help="將追蹤區段寫入 JSON Lines 檔案")
+    parser.add_argument("--otlp", metavar="URL", help="將追蹤區段送到 OpenTelemetry 收集器，例如 http://localhost:4318")
+    args = parser.parse_args()
+
+    if args.profile or args.trace or args.otlp:
+        tracing.TRACER.configure(jsonl_path=args.trace, otlp_endpoint=args.otlp)
+
     print("歡迎來到 RPG 遊戲！")
-    game.start_game()
+    try:
+        game.start_game()
+    finally:
+        tracing.TRACER.shutdown()
+        if args.profile:
+            print("\n--- 效能統計 ---")
+            print(tracing.TRACER.report())
 
 if __name__ == "__main__":
     main()
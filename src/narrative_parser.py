@@ -0,0 +1,294 @@
+import json
+import re
+
+# 行首的欄位標籤；全形冒號也視為有效
+_HEADER = re.compile(r"(成長點數|信仰|腐化|獲得物品|獲得技能|獲得奇蹟|創建物品|創建技能|創建奇蹟|敘述)\s*[:：]\s*")
+_LEADING_SPACE = re.compile(r"\s*")
+_INLINE_SPACE = re.compile(r"[ \t\u3000]*")
+_BLOCK_END = re.compile(r"[ \t\u3000]*\n?")
+_INT = re.compile(r"[+-]?\d+")
+_FAITH = re.compile(r"(.+?)\s*[,，]\s*([+-]?\d+)")
+# 掃描 JSON 時只需要停在這些字元上
+_JSON_SPECIAL = re.compile(r'[{}"]')
+_JSON_STRING_SPECIAL = re.compile(r'["\\]')
+
+_CREATE_KINDS = {"創建物品": "item", "創建技能": "skill", "創建奇蹟": "miracle"}
+_RECEIVED_FIELDS = {"獲得物品": "item_received", "獲得技能": "skill_received", "獲得奇蹟": "miracle_received"}
+_NARRATIVE_LABEL = "敘述"
+_LABELS = ("成長點數", "信仰", "腐化", "獲得物品", "獲得技能", "獲得奇蹟", "創建物品", "創建技能", "創建奇蹟", _NARRATIVE_LABEL)
+
+
+def _may_become_header(fragment):
+    """尚未結束的一行是否可能在更多文字到達後成為標頭行。"""
+    text = fragment.lstrip()
+    for label in _LABELS:
+        if label.startswith(text) or (text.startswith(label) and not text[len(label):].strip()):
+            return True
+    return False
+
+
+def parse_narrative(text):
+    """一次解析完整的敘述回應，回傳與 NarrativeStreamParser.close 相同的 10 元組。"""
+    parser = NarrativeStreamParser()
+    parser.feed(text)
+    return parser.close()
+
+
+class NarrativeStreamParser:
+    """
+    敘述回應的單次掃描解析器，可以逐塊送入串流，也可以一次送入完整回應。
+
+    標頭行（成長點數、信仰、腐化、獲得…）以預先編譯的標籤比對，在整行到達時立即解析；
+    「創建」區塊以括號配對的方式掃描到 JSON 結束為止，可正確處理巢狀物件；
+    「敘述:」之後的文字轉交給 on_text 回呼；不可能是標頭的行不等待換行就送出，
+    出現在敘述之後的標頭行與「創建」區塊仍會被解析，不會混進敘述中。
+    每個字元只會被掃描一次。
+    """
+
+    def __init__(self, on_text=None):
+        self.on_text = on_text
+        self.gp_awarded = 0
+        self.faith_change = None
+        self.corruption_change = 0
+        self.item_received = None
+        self.skill_received = None
+        self.miracle_received = None
+        self.definitions = {"item": None, "skill": None, "miracle": None}
+        self.narrative = ""
+
+        self._buffer = ""
+        self._pos = 0
+        self._in_narrative = False
+        self._line_open = False # 敘述中目前這一行已經開始送出，剩下的部分都是敘述
+        self._after_block = False # 敘述中剛結束一個「創建」區塊，略過區塊後的換行
+        self._fallback_lines = []
+        # 「創建」區塊的掃描狀態
+        self._json_kind = None
+        self._json_parts = []
+        self._json_start = None
+        self._json_depth = 0
+        self._json_in_string = False
+        self._json_escape = False
+
+    def feed(self, chunk):
+        """送入一段新到達的回應文字。"""
+        if not chunk:
+            return
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        self._scan(final=False)
+
+    def close(self):
+        """串流結束，處理剩餘的文字並回傳 10 元組的解析結果。"""
+        self._scan(final=True)
+        if self._json_kind:
+            print(f"【錯誤】AI創造的JSON區塊不完整：{''.join(self._json_parts)}")
+            self._json_kind = None
+        self._buffer, self._pos = "", 0
+
+        # 完全沒有敘述標籤時，將無法解析的行視為敘述
+        if not self.narrative.strip() and self._fallback_lines:
+            self._emit("\n".join(self._fallback_lines))
+
+        return self.result()
+
+    def result(self):
+        """以 10 元組回傳目前已解析的內容。"""
+        return (
+            self.narrative.strip(),
+            self.gp_awarded,
+            self.faith_change,
+            self.corruption_change,
+            self.item_received,
+            self.definitions["item"],
+            self.skill_received,
+            self.definitions["skill"],
+            self.miracle_received,
+            self.definitions["miracle"],
+        )
+
+    def _emit(self, text):
+        if not text:
+            return
+        self.narrative += text
+        if self.on_text:
+            self.on_text(text)
+
+    def _scan(self, final):
+        if self._in_narrative:
+            self._scan_narrative(final)
+            return
+        buffer = self._buffer
+        end = len(buffer)
+        while self._pos < end and not self._in_narrative:
+            if self._json_kind:
+                if not self._consume_json():
+                    return
+                continue
+
+            pos = _LEADING_SPACE.match(buffer, self._pos).end()
+            if pos == end:
+                self._pos = pos
+                return
+            match = _HEADER.match(buffer, pos)
+            label = match.group(1) if match else None
+
+            if label == _NARRATIVE_LABEL:
+                # 標籤之後同一行的文字一定是敘述
+                self._in_narrative = True
+                self._line_open = True
+                self._pos = match.end()
+                self._scan_narrative(final)
+                return
+            if label in _CREATE_KINDS:
+                self._start_json(_CREATE_KINDS[label], match.end())
+                continue
+
+            newline = buffer.find("\n", pos)
+            if newline == -1:
+                if not final:
+                    # 等待這一行剩下的部分
+                    self._pos = pos
+                    return
+                newline = end
+            line = buffer[pos:newline].rstrip()
+            self._pos = newline + 1
+            if match:
+                self._handle_field(label, buffer[match.end():newline].strip(), line)
+            elif line:
+                self._fallback_lines.append(line)
+
+    def _scan_narrative(self, final):
+        buffer = self._buffer
+        end = len(buffer)
+        while self._pos < end:
+            if self._json_kind:
+                if not self._consume_json():
+                    return
+                buffer, end = self._buffer, len(self._buffer)
+                self._after_block = True
+                continue
+            if self._after_block:
+                # 區塊結尾的換行不屬於敘述
+                match = _BLOCK_END.match(buffer, self._pos)
+                self._pos = match.end()
+                if not match.group().endswith("\n") and self._pos == end:
+                    return
+                self._after_block = False
+                continue
+
+            pos = self._pos
+            newline = buffer.find("\n", pos)
+            line_end = end if newline == -1 else newline
+            if not self._line_open:
+                match = _HEADER.match(buffer, _INLINE_SPACE.match(buffer, pos).end())
+                label = match.group(1) if match else None
+                if label in _CREATE_KINDS:
+                    self._start_json(_CREATE_KINDS[label], match.end())
+                    continue
+                if label == _NARRATIVE_LABEL:
+                    pos = match.end()
+                elif match:
+                    if newline == -1 and not final:
+                        return
+                    self._handle_field(label, buffer[match.end():line_end].strip(), buffer[pos:line_end].strip())
+                    self._pos = line_end + 1
+                    continue
+                elif newline == -1 and not final and _may_become_header(buffer[pos:end]):
+                    # 等待更多文字才能判斷這一行是不是標頭
+                    return
+
+            if newline == -1:
+                self._line_open = True
+                self._pos = end
+                self._emit(buffer[pos:end])
+            else:
+                self._line_open = False
+                self._pos = newline + 1
+                self._emit(buffer[pos:newline + 1])
+
+    def _start_json(self, kind, pos):
+        self._json_kind = kind
+        self._json_parts = []
+        self._json_start = None
+        self._json_depth = 0
+        self._json_in_string = False
+        self._json_escape = False
+        self._pos = pos
+
+    def _consume_json(self):
+        """從目前位置掃描 JSON，區塊結束時回傳 True；需要更多文字時回傳 False。"""
+        buffer = self._buffer
+        pos = self._pos
+        if self._json_start is None:
+            pos = _LEADING_SPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                self._pos = pos
+                return False
+            if buffer[pos] != "{":
+                # 「創建」之後不是 JSON，放棄這個區塊
+                print(f"【錯誤】AI創造的區塊缺少JSON內容：{buffer[pos:].strip()}")
+                self._json_kind = None
+                self._pos = pos
+                return True
+            self._json_start = pos
+
+        if self._json_escape and pos < len(buffer):
+            self._json_escape = False
+            pos += 1
+        while True:
+            pattern = _JSON_STRING_SPECIAL if self._json_in_string else _JSON_SPECIAL
+            match = pattern.search(buffer, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if self._json_in_string:
+                if char == "\\":
+                    if pos == len(buffer):
+                        self._json_escape = True
+                        break
+                    pos += 1
+                else:
+                    self._json_in_string = False
+            elif char == '"':
+                self._json_in_string = True
+            elif char == "{":
+                self._json_depth += 1
+            else:
+                self._json_depth -= 1
+                if self._json_depth == 0:
+                    self._json_parts.append(buffer[self._json_start:pos])
+                    self._pos = pos
+                    self._finish_json()
+                    return True
+
+        # 區塊尚未結束：保留已掃描的部分，下一段文字從頭接續
+        self._json_parts.append(buffer[self._json_start:])
+        self._json_start = 0
+        self._buffer, self._pos = "", 0
+        return False
+
+    def _finish_json(self):
+        kind = self._json_kind
+        json_text = "".join(self._json_parts)
+        self._json_kind = None
+        self._json_parts = []
+        try:
+            self.definitions[kind] = json.loads(json_text)
+        except json.JSONDecodeError as e:
+            print(f"【錯誤】解析AI創造的JSON時發生錯誤：{e}\n原始JSON字串：{json_text}")
+
+    def _handle_field(self, label, value, line):
+        try:
+            if label == "成長點數":
+                self.gp_awarded = int(_INT.search(value).group())
+            elif label == "信仰":
+                match = _FAITH.match(value)
+                self.faith_change = (match.group(1).strip(), int(match.group(2)))
+            elif label == "腐化":
+                self.corruption_change = int(_INT.search(value).group())
+            else:
+                setattr(self, _RECEIVED_FIELDS[label], value or None)
+        except AttributeError:
+            print(f"【錯誤】解析AI敘述時發生錯誤：無法解析「{label}」欄位\n原始內容：{line}")
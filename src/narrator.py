@@ -1,24 +1,25 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-import json
 import re
+import threading
 
-load_dotenv()
+from history import HistoryManager, to_serializable
+from location_cache import LocationCache
+from narrative_parser import NarrativeStreamParser, parse_narrative
+from prompt_context import PromptContext
+import schemas
+import tracing
 
 # --- Constants ---
-# 將重複的 Prompt 指令抽出來，方便維護
-_NARRATIVE_PROMPT_TEMPLATE = """
-作為這個RPG世界的遊戲管理員(GM)，請根據玩家的行動和結果，生動地描述接下來發生的事情。
-玩家資訊：{player_info}
-玩家行動：'{action}'
-擲骰結果：{outcome_str}
+# 固定的規則與格式只在建立模型時以 system instruction 送出一次，
+# 每回合的訊息只帶入會變動的欄位，對話歷史中也不會累積重複的規則。
+# system instruction 與 JSON 模式都需要 Gemini 1.5 以後的模型
+_MODEL_NAME = 'gemini-1.5-flash'
+_JSON_CONFIG = {"response_mime_type": "application/json"}
 
-你的核心任務是推動故事發展，並根據情境給予獎勵或後果。
-**請務必參考玩家的「特殊能力」、「詛咒」與「奇蹟」，將它們的效果融入到敘述中。**
-你可以選擇給予玩家一個已知的物品/技能/奇蹟，或是在極其稀有、關鍵的時刻，創造一個全新的傳說物品、獨特技能或神聖奇蹟。
+_WORLD_SETTING = "這是一個有科技、魔法與超能力、神話生物存在的現代平行地球。現在地球上的大都市小城市，都會在這世界出現。"
 
-請嚴格按照以下格式回傳，不要有任何多餘的文字，若無變化則該行省略：
+# 敘述回應的格式規範與規則
+_NARRATIVE_FORMAT = """請嚴格按照以下格式回傳，不要有任何多餘的文字，若無變化則該行省略：
 
 成長點數:[數字]
 信仰:[神祇名稱],[+/-點數]
@@ -27,238 +28,559 @@ _NARRATIVE_PROMPT_TEMPLATE = """
 獲得技能:[技能名稱]
 獲得奇蹟:[奇蹟名稱]
 創建物品:
-{{
+{
     "type": "[類型]",
     "slot": "[裝備位置]",
     "description": "[描述]",
-    "bonus": {{ "屬性": 點數 }},
+    "bonus": { "屬性": 點數 },
     "ability": "[能力]"
-}}
+}
 創建技能:
-{{
+{
     "cost": [GP成本],
     "description": "[技能描述]"
-}}
+}
 創建奇蹟:
-{{
+{
     "faith_cost": [信仰成本],
     "deity": "[對應神祇]",
     "description": "[奇蹟描述]"
-}}
-敘述:[接下來發生的事情]
+}
+敘述:[接下來發生的事情]"""
 
---- 重要規則 ---
+_NARRATIVE_RULES = """--- 重要規則 ---
 1.  **創造時機**: 創造新東西應該是非常罕見的事件，只在劇情達到高潮、玩家有重大發現或完成偉大成就時發生。
 2.  **格式準確**: 「創建」區塊必須是完整的 JSON 格式。如果新創造物沒有某個屬性，請直接省略該鍵值對。
 3.  **名稱對應**: 只有在「創建」區塊被填寫時，「獲得」的名稱才應該是這個新創造的東西。
 4.  **敘述為本**: 「敘述」是必要部分，必須提供。
-5.  **類型分離**: 一次回應中，最多只能創造一種類型（物品、技能、奇蹟擇一）。
-"""
+5.  **類型分離**: 一次回應中，最多只能創造一種類型（物品、技能、奇蹟擇一）。"""
+
+# 結構化回應模式：要求模型回傳符合 schemas.NARRATIVE_SCHEMA 的 JSON
+_STRUCTURED_NARRATIVE_FORMAT = """請只回傳一個符合以下 JSON Schema 的 JSON 物件，不要有任何多餘的文字，沒有變化的欄位請省略：
+""" + schemas.describe(schemas.NARRATIVE_SCHEMA)
+
+_STRUCTURED_NARRATIVE_RULES = """--- 重要規則 ---
+1.  **創造時機**: 創造新東西應該是非常罕見的事件，只在劇情達到高潮、玩家有重大發現或完成偉大成就時發生。
+2.  **給予與創造**: item/skill/miracle 的 name 是玩家獲得的東西；只有全新創造時才填寫 definition，格式與遊戲中現有的定義相同。
+3.  **敘述為本**: narrative 是必要欄位，必須提供。
+4.  **類型分離**: 一次回應中，最多只能創造一種類型（物品、技能、奇蹟擇一）。"""
+
+_JUDGE_QUESTIONS = """1.  這個動作在當前情境下是否合理？
+2.  這個動作是否需要透過擲骰來決定成功與否？（例如：攻擊、說服、潛行等需要判斷，而簡單的移動或對話則不需要）
+3.  如果需要擲骰，需要擲幾顆d20？（根據難度決定，1-5顆）
+4.  如果需要擲骰，成功的目標值是多少？（根據難度決定，1-100）"""
+
+# 敘事對話的 system instruction
+_NARRATOR_INSTRUCTION_TEMPLATE = """你是這個RPG世界的遊戲管理員(GM)。
+世界觀：{world}
+
+你會收到三種訊息。其中的玩家資訊可能只列出與上一則訊息相比有變化的欄位，其餘欄位沿用先前的值。
+
+一、一般訊息（例如描述場景）：以生動的文字直接回應。
+
+二、以「【敘述】」開頭的訊息：根據其中的玩家資訊、玩家行動與擲骰結果，生動地描述接下來發生的事情。
+你的核心任務是推動故事發展，並根據情境給予獎勵或後果。
+**請務必參考玩家的「特殊能力」、「詛咒」與「奇蹟」，將它們的效果融入到敘述中。**
+你可以選擇給予玩家一個已知的物品/技能/奇蹟，或是在極其稀有、關鍵的時刻，創造一個全新的傳說物品、獨特技能或神聖奇蹟。
+回應必須遵守下方的「敘述格式」。
+
+三、以「【判定與敘述】」開頭的訊息：一次完成玩家行動的判定與敘述。請先判斷：
+{questions}
+
+第一行請嚴格按照以下格式回傳判定：
+判定:合理性(是/否),需要擲骰(是/否),擲骰顆數(數字),目標值(數字),原因/說明
+
+接著依判定結果回傳敘述區塊：
+- 不合理：只回傳判定行。
+- 合理且不需擲骰：回傳一個以「【結果】」開頭的區塊。
+- 需要擲骰：回傳以「【成功】」開頭與以「【失敗】」開頭的兩個區塊，分別描述擲骰成功與失敗時發生的事情，兩者的獎勵與後果應各自獨立。
+每個敘述區塊都必須遵守下方的「敘述格式」。
+
+--- 敘述格式 ---
+{format}
+
+{rules}"""
+
+_JUDGE_TEXT_FORMAT = """請嚴格按照以下格式回傳，不要有任何多餘的文字：
+合理性(是/否),需要擲骰(是/否),擲骰顆數(數字),目標值(數字),原因/說明
+
+範例：
+是,是,2,30,因為你想說服守衛，這有一定難度。
+是,否,0,0,你只是想走進酒吧，這不需要擲骰。
+否,否,0,0,你不能在城市中心召喚隕石雨。
+是,是,1,15,你擁有「光學迷彩」能力，潛行難度降低了。"""
+
+_JUDGE_JSON_FORMAT = """請只回傳一個符合以下 JSON Schema 的 JSON 物件，不要有任何多餘的文字：
+""" + schemas.describe(schemas.VERDICT_SCHEMA) + """
+
+範例：
+{"valid": true, "needs_roll": true, "num_dice": 2, "target": 30, "reason": "因為你想說服守衛，這有一定難度。"}
+{"valid": false, "needs_roll": false, "num_dice": 0, "target": 0, "reason": "你不能在城市中心召喚隕石雨。"}"""
+
+# 規則判定通道的 system instruction
+_JUDGE_INSTRUCTION_TEMPLATE = """你是RPG遊戲的遊戲管理員(GM)，負責判定玩家的動作。
+世界觀：{world}
+
+每則訊息會提供玩家的狀態、地點、目前場景與玩家動作。請根據玩家的屬性、能力、詛咒、動作和情境判斷：
+{questions}
+
+{format}"""
+
+
+def _narrator_instruction(structured):
+    return _NARRATOR_INSTRUCTION_TEMPLATE.format(
+        world=_WORLD_SETTING,
+        questions=_JUDGE_QUESTIONS,
+        format=_STRUCTURED_NARRATIVE_FORMAT if structured else _NARRATIVE_FORMAT,
+        rules=_STRUCTURED_NARRATIVE_RULES if structured else _NARRATIVE_RULES,
+    )
+
+
+def _judge_instruction(structured):
+    return _JUDGE_INSTRUCTION_TEMPLATE.format(
+        world=_WORLD_SETTING,
+        questions=_JUDGE_QUESTIONS,
+        format=_JUDGE_JSON_FORMAT if structured else _JUDGE_TEXT_FORMAT,
+    )
+
+
+# 每回合的訊息只帶入會變動的欄位
+_NARRATIVE_PROMPT_TEMPLATE = """【敘述】
+{player_info}
+玩家行動：'{action}'
+擲骰結果：{outcome_str}"""
+
+# 單次呼叫模式：同時回傳判定與成功/失敗兩種預先寫好的敘述
+_RESOLVE_PROMPT_TEMPLATE = """【判定與敘述】
+{player_info}
+玩家行動：'{action}'"""
+
+# 結構化回應不符合格式時，要求模型修正一次
+_REPAIR_PROMPT_TEMPLATE = """你上一個回應不符合要求的 JSON 格式，問題如下：
+{errors}
+請修正並只回傳符合以下 JSON Schema 的 JSON 物件，不要有任何多餘的文字：
+{schema}
+你上一個回應：
+{reply}"""
+
+_BRANCH_KEYS = {"結果": "result", "成功": "success", "失敗": "failure"}
+
+_VERDICT_SEPARATOR = re.compile(r"[,，]")
+
+# 規則判定時附帶的最近場景長度上限（字元）
+_JUDGE_SCENE_CHARS = 300
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _api_key():
+    """讀取 API 金鑰；有安裝 python-dotenv 時先載入 .env。"""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        pass
+    else:
+        load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("未找到 GEMINI_API_KEY 環境變數")
+    return api_key
+
+
+def _load_genai(api_key):
+    """第一次需要時才匯入 google.generativeai（匯入本身需要數百毫秒）並設定金鑰。"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+    return _genai
+
+
+class _PendingChat:
+    """模型建立前暫存對話歷史，介面與 ChatSession 的 history 相同。"""
+
+    def __init__(self, history=None):
+        self.history = list(history or [])
+
 
 class Narrator:
-    def __init__(self):
+    def __init__(self, history_manager=None, model_summary=False, structured=False):
         """
         初始化敘事者，設置 Gemini API。
+        history_manager 控制對話歷史的預算；model_summary 為 True 時，
+        舊回合會以一次額外的模型呼叫壓縮成前情提要，否則使用本地摘要。
+        structured 為 True 時，判定與敘述以 JSON 模式回傳並在本地依結構驗證。
+        """
+        self.api_key = _api_key()
+        self.structured = structured
+        # SDK 與模型在第一次真正需要呼叫 API 時才建立，見 _ensure_client 與 warm_up
+        self._model = None
+        self._judge_model = None
+        self._client_lock = threading.Lock()
+        self.chat = _PendingChat()
+        self.last_scene = ""
+        # 地點描述只取決於模型、世界觀與地點名稱，快取鍵以這些內容計算
+        self.location_cache = LocationCache(context=f"{_MODEL_NAME}\n{_WORLD_SETTING}")
+        self.history = history_manager or HistoryManager()
+        # 敘述 prompt 的玩家資訊只送出與上次相比的變化
+        self.prompt_context = PromptContext()
+        if model_summary:
+            self.history.summarizer = self._summarize_with_model
+
+    def _ensure_client(self):
+        """匯入 SDK 並建立敘事與判定模型；可在任何執行緒中呼叫，只會建立一次。"""
+        if self._model is None:
+            with self._client_lock:
+                if self._model is None:
+                    with tracing.span("narrator.client_init"):
+                        genai = _load_genai(self.api_key)
+                        self._judge_model = genai.GenerativeModel(
+                            _MODEL_NAME,
+                            system_instruction=_judge_instruction(self.structured),
+                            generation_config=_JSON_CONFIG if self.structured else None,
+                        )
+                        self._model = genai.GenerativeModel(
+                            _MODEL_NAME, system_instruction=_narrator_instruction(self.structured))
+
+    @property
+    def model(self):
+        self._ensure_client()
+        return self._model
+
+    @property
+    def judge_model(self):
+        # 規則判定使用獨立、不帶對話歷史的通道
+        self._ensure_client()
+        return self._judge_model
+
+    def warm_up(self):
+        """
+        在背景執行緒中預先匯入 SDK 並建立模型，讓第一次呼叫不必等待。
+        失敗時不做任何處理，錯誤會在第一次真正呼叫時再次出現。
+        """
+        def run():
+            try:
+                self._ensure_client()
+            except Exception:
+                pass
+        threading.Thread(target=run, name="narrator-warm-up", daemon=True).start()
+
+    def _start_chat(self, history):
+        """以指定的歷史重新開始對話；模型尚未建立時只保存歷史。"""
+        if self._model is None:
+            self.chat = _PendingChat(history)
+        else:
+            self.chat = self._model.start_chat(history=history)
+
+    def _live_chat(self):
+        """回傳可以送出訊息的對話，必要時建立模型並接上已保存的歷史。"""
+        if isinstance(self.chat, _PendingChat):
+            self.chat = self.model.start_chat(history=self.chat.history)
+        return self.chat
+
+    def restore_history(self, history, summary=""):
+        """
+        從存檔恢復對話歷史與前情提要。
+        """
+        self.history.summary = summary
+        self._start_chat(history)
+        self.prompt_context.reset()
+        replies = [c["parts"][0] for c in history if c.get("role") == "model" and c.get("parts")]
+        self.last_scene = replies[-1] if replies else ""
+
+    def _send(self, prompt, **kwargs):
+        """
+        透過對話送出訊息，並在回應後維持對話歷史的預算。
+        """
+        with tracing.span("narrator.send") as span:
+            response = self._live_chat().send_message(prompt, **kwargs)
+            tracing.record_exchange(span, prompt, response.text, response)
+        self._maintain_history()
+        return response
+
+    def _maintain_history(self):
+        history = self.chat.history
+        if self.history.needs_compaction(history):
+            self._start_chat(self.history.compact(history))
+            # 舊回合中的玩家狀態已被壓縮掉，下一次重新送出完整狀態
+            self.prompt_context.reset()
+
+    def _summarize_with_model(self, previous_summary, replies):
+        """
+        以一次模型呼叫將舊回合濃縮進前情提要。
         """
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("未找到 GEMINI_API_KEY 環境變數")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.chat = self.model.start_chat(history=[])
+        prompt = f"""請將以下RPG遊戲的劇情濃縮成一段不超過300字的前情提要，保留重要人物、地點、獲得的物品與未完成的事件。
+目前的前情提要：{previous_summary if previous_summary else '無'}
+新的劇情：
+{chr(10).join(replies)}"""
+        with tracing.span("narrator.summarize") as span:
+            response = self.model.generate_content(prompt)
+            tracing.record_exchange(span, prompt, response.text, response)
+        return response.text.strip()
 
     def describe_scene(self, player, world):
         """
         使用 Gemini API 生成場景描述。
+        同一地點的描述會被快取；命中快取時不呼叫 API，只把描述記入對話歷史。
+        場景內容取決於玩家，因此只存在這場遊戲的 World.locations，不寫入跨遊戲共用的磁碟快取。
         """
         prompt = f"玩家 {player.name} ({player.race}) 的屬性為 {player.attributes}，現在位於 {player.location}。請描述一下周圍的環境和發生的事情。"
-        response = self.chat.send_message(prompt)
-        return response.text
+        description = self.location_cache.get(player.location, world, shared=False)
+        if description is None:
+            description = self._send(prompt).text
+            self.location_cache.put(player.location, description, world, shared=False)
+        else:
+            self._remember(prompt, description)
+        self.last_scene = description
+        return description
 
-    def generate_location_description(self, location_name):
+    def generate_location_description(self, location_name, world=None):
         """
         使用 Gemini API 生成地點描述。
+        提供 world 時會先查詢地點快取，生成的描述也會存入 World.locations 與磁碟快取。
+        描述與對話無關，因此不經過對話歷史。
+        """
+        if world is not None:
+            description = self.location_cache.get(location_name, world)
+            if description is not None:
+                return description
+
+        description = self.fetch_location_description(location_name)
+        if world is not None:
+            self.location_cache.put(location_name, description, world)
+        return description
+
+    def fetch_location_description(self, location_name):
+        """
+        直接呼叫 API 生成地點描述，不讀寫任何快取；可在背景執行緒中安全呼叫。
         """
         prompt = f"""請為這個RPG遊戲生成一個地點的詳細描述。
 地點名稱：{location_name}
-世界觀：這是一個有科技、魔法與超能力、神話生物存在的現代平行地球。現在地球上的大都市小城市，都會在這世界出現。
-請根據這個世界觀，為 {location_name} 產生一段生動的描述，包含它的特色、氛圍和可能的遭遇。"""
-        response = self.chat.send_message(prompt)
+請根據世界觀，為 {location_name} 產生一段生動的描述，包含它的特色、氛圍和可能的遭遇。"""
+        with tracing.span("narrator.location", location=location_name) as span:
+            response = self.model.generate_content(prompt)
+            tracing.record_exchange(span, prompt, response.text, response)
         return response.text
 
+    def _remember(self, prompt, reply):
+        """
+        不呼叫 API，直接將一組對話記入歷史，讓後續敘述知道這段內容。
+        """
+        history = to_serializable(self.chat.history)
+        history.append({"role": "user", "parts": [prompt]})
+        history.append({"role": "model", "parts": [reply]})
+        self._start_chat(history)
+        self._maintain_history()
+
     def evaluate_action(self, action, player, world):
         """
         使用 Gemini API 評估玩家的動作，決定是否合理、是否需要擲骰，以及擲骰的參數。
+        判定走獨立的 generate_content 通道，只帶入玩家當下的狀態與最近的場景，
+        不寫入也不重送敘事的對話歷史。
         """
         player_total_attrs = player.get_total_attributes(world)
         player_abilities = player.get_active_abilities(world)
         player_curses = player.get_curses(world)
+        scene = self.last_scene[-_JUDGE_SCENE_CHARS:] if self.last_scene else '無'
 
-        prompt = f"""這是一個RPG遊戲的GM請求。
-玩家：{player.name} ({player.race})
+        prompt = f"""玩家：{player.name} ({player.race})
 屬性：{player_total_attrs}
 地點：{player.location}
 特殊能力: {player_abilities if player_abilities else '無'}
 詛咒: {player_curses if player_curses else '無'}
-玩家動作：'{action}'
+目前場景：{scene}
+玩家動作：'{action}'"""
+        if self.structured:
+            data = self._request_structured(self._judge, prompt, schemas.VERDICT_SCHEMA)
+            if data is None:
+                return False, "GM似乎有點困惑，請換個方式說說你的想法。", False, 0, 0
+            return schemas.verdict_tuple(data)
 
-請根據玩家的屬性、能力、詛咒、動作和情境判斷：
-1.  這個動作在當前情境下是否合理？
-2.  這個動作是否需要透過擲骰來決定成功與否？（例如：攻擊、說服、潛行等需要判斷，而簡單的移動或對話則不需要）
-3.  如果需要擲骰，需要擲幾顆d20？（根據難度決定，1-5顆）
-4.  如果需要擲骰，成功的目標值是多少？（根據難度決定，1-100）
+        reply = self._judge(prompt)
+        try:
+            return self._parse_verdict(reply)
+        except Exception as e:
+            print(f"【錯誤】解析AI回應時發生錯誤：{e}\n原始回應：{reply}")
+            return False, "GM似乎有點困惑，請換個方式說說你的想法。", False, 0, 0
 
-請嚴格按照以下格式回傳，不要有任何多餘的文字：
-合理性(是/否),需要擲骰(是/否),擲骰顆數(數字),目標值(數字),原因/說明
+    def _judge(self, prompt):
+        """透過無狀態的判定通道送出 prompt，回傳回應文字。"""
+        with tracing.span("narrator.judge") as span:
+            response = self.judge_model.generate_content(prompt)
+            tracing.record_exchange(span, prompt, response.text, response)
+        return response.text
 
-範例：
-是,是,2,30,因為你想說服守衛，這有一定難度。
-是,否,0,0,你只是想走進酒吧，這不需要擲骰。
-否,否,0,0,你不能在城市中心召喚隕石雨。
-是,是,1,15,你擁有「光學迷彩」能力，潛行難度降低了。
-"""
-        response = self.chat.send_message(prompt)
+    def _request_structured(self, send, prompt, schema, on_repaired=None):
+        """
+        以 send 送出要求 JSON 的 prompt 並依 schema 驗證回應。
+        不符合時附上錯誤送出一次修正請求；修正成功後呼叫 on_repaired，仍失敗則回傳 None。
+        """
+        reply = send(prompt)
+        try:
+            return schemas.parse(reply, schema)
+        except ValueError as e:
+            errors = str(e)
+        repair_prompt = _REPAIR_PROMPT_TEMPLATE.format(errors=errors, schema=schemas.describe(schema), reply=reply)
+        with tracing.span("narrator.repair"):
+            reply = send(repair_prompt)
         try:
-            parts = response.text.strip().split(',')
-            is_valid = parts[0] == '是'
-            needs_roll = parts[1] == '是'
-            num_dice = int(parts[2])
-            target = int(parts[3])
-            reason = parts[4]
-            return is_valid, reason, needs_roll, num_dice, target
+            data = schemas.parse(reply, schema)
+        except ValueError as e:
+            print(f"【錯誤】AI回應不符合格式：{e}\n原始回應：{reply}")
+            return None
+        if on_repaired:
+            on_repaired()
+        return data
+
+    @staticmethod
+    def _parse_verdict(text):
+        """解析「合理性,需要擲骰,擲骰顆數,目標值,原因」格式的判定。"""
+        # 原因/說明可能含有逗號，只切出前四個欄位
+        parts = _VERDICT_SEPARATOR.split(text.strip(), maxsplit=4)
+        is_valid = parts[0].strip() == '是'
+        needs_roll = parts[1].strip() == '是'
+        num_dice = int(parts[2])
+        target = int(parts[3])
+        reason = parts[4].strip()
+        return is_valid, reason, needs_roll, num_dice, target
+
+    def resolve_action(self, action, player, world):
+        """
+        單次呼叫模式：在同一個回應中取得判定與預先寫好的敘述分支。
+        回傳 (is_valid, reason, needs_roll, num_dice, target, branches)，
+        branches 的鍵為 "result"（不需擲骰）或 "success"/"failure"，值為原始敘述文字。
+        選定分支後需呼叫 choose_branch，讓對話歷史只保留實際發生的結果。
+        """
+        prompt = _RESOLVE_PROMPT_TEMPLATE.format(
+            player_info=self.prompt_context.build(player, world),
+            action=action
+        )
+        response = self._send(prompt)
+        self.prompt_context.commit()
+        try:
+            return self._parse_resolution(response.text)
         except Exception as e:
             print(f"【錯誤】解析AI回應時發生錯誤：{e}\n原始回應：{response.text}")
-            return False, "GM似乎有點困惑，請換個方式說說你的想法。", False, 0, 0
+            return False, "GM似乎有點困惑，請換個方式說說你的想法。", False, 0, 0, {}
+
+    def _parse_resolution(self, text):
+        verdict_line, _, body = text.strip().partition('\n')
+        if not verdict_line.startswith("判定:"):
+            raise ValueError("缺少判定行")
+        is_valid, reason, needs_roll, num_dice, target = self._parse_verdict(verdict_line.split(':', 1)[1])
+
+        branches = {}
+        for key, text_block in re.findall(r"【(結果|成功|失敗)】\s*(.*?)(?=【(?:結果|成功|失敗)】|\Z)", body, re.DOTALL):
+            branches[_BRANCH_KEYS[key]] = text_block.strip()
+        if is_valid:
+            expected = ("success", "failure") if needs_roll else ("result",)
+            missing = [key for key in expected if key not in branches]
+            if missing:
+                raise ValueError(f"缺少敘述區塊：{', '.join(missing)}")
+        return is_valid, reason, needs_roll, num_dice, target, branches
 
-    def get_no_roll_outcome(self, action, player, world):
+    def choose_branch(self, branches, key):
+        """
+        採用指定的敘述分支：將對話歷史中的回應改寫為該分支，並解析其內容。
+        """
+        text = branches[key]
+        history = to_serializable(self.chat.history)
+        if history and history[-1]["role"] == "model":
+            history[-1] = {"role": "model", "parts": [text]}
+            self._start_chat(history)
+        result = None
+        if self.structured:
+            try:
+                result = schemas.narrative_tuple(schemas.parse(text, schemas.NARRATIVE_SCHEMA))
+            except ValueError as e:
+                print(f"【錯誤】AI回應不符合格式：{e}，改用文字格式解析。")
+        if result is None:
+            result = self._parse_narrative_response(text)
+        self.last_scene = result[0]
+        return result
+
+    def get_no_roll_outcome(self, action, player, world, on_text=None):
         """
         對於不需要擲骰的動作，直接生成結果。
+        提供 on_text 時，敘述會以串流方式逐段送出。
         """
-        player_info = (
-            f"{player.name} ({player.race}, HP: {player.hp}/{player.get_max_hp(world)}, "
-            f"屬性: {player.get_total_attributes(world)}, "
-            f"腐化: {player.corruption}, 信仰: {player.faith}, "
-            f"技能: {player.skills}, "
-            f"奇蹟: {player.miracles if player.miracles else '無'}, "
-            f"特殊能力: {player.get_active_abilities(world) if player.get_active_abilities(world) else '無'}, "
-            f"詛咒: {player.get_curses(world) if player.get_curses(world) else '無'})"
-        )
+        player_info = self.prompt_context.build(player, world)
         prompt = _NARRATIVE_PROMPT_TEMPLATE.format(
             player_info=player_info,
             action=action,
             outcome_str="無 (非判定動作)"
         )
-        response = self.chat.send_message(prompt)
-        return self._parse_narrative_response(response.text)
+        return self._send_narrative_prompt(prompt, on_text)
 
-    def narrate_outcome(self, action, dice_roll, is_success, player, world):
+    def narrate_outcome(self, action, dice_roll, is_success, player, world, on_text=None):
         """
         使用 Gemini API 根據擲骰結果和動作決定結果。
+        提供 on_text 時，敘述會以串流方式逐段送出。
         """
         success_str = "成功" if is_success else "失敗"
         outcome_str = f"擲骰 {dice_roll} -> {success_str}"
-        player_info = (
-            f"{player.name} ({player.race}, HP: {player.hp}/{player.get_max_hp(world)}, "
-            f"屬性: {player.get_total_attributes(world)}, "
-            f"腐化: {player.corruption}, 信仰: {player.faith}, "
-            f"技能: {player.skills}, "
-            f"奇蹟: {player.miracles if player.miracles else '無'}, "
-            f"特殊能力: {player.get_active_abilities(world) if player.get_active_abilities(world) else '無'}, "
-            f"詛咒: {player.get_curses(world) if player.get_curses(world) else '無'})"
-        )
-        
+        player_info = self.prompt_context.build(player, world)
+
         prompt = _NARRATIVE_PROMPT_TEMPLATE.format(
             player_info=player_info,
             action=action,
             outcome_str=outcome_str
         )
-        response = self.chat.send_message(prompt)
-        return self._parse_narrative_response(response.text)
+        return self._send_narrative_prompt(prompt, on_text)
+
+    def _send_narrative_prompt(self, prompt, on_text=None):
+        """
+        送出敘述請求。提供 on_text 時以串流模式接收，敘述文字會逐段交給 on_text，
+        標頭欄位則隨著回應到達即時解析。
+        """
+        if self.structured:
+            # JSON 回應無法邊到達邊顯示，完整驗證後才回傳
+            data = self._request_structured(
+                lambda text: self._send(text, generation_config=_JSON_CONFIG).text,
+                prompt, schemas.NARRATIVE_SCHEMA, on_repaired=self._forget_repair)
+            if data is None:
+                result = "GM似乎有點困惑，故事停頓了一下。", 0, None, 0, None, None, None, None, None, None
+            else:
+                result = schemas.narrative_tuple(data)
+        elif on_text is None:
+            response = self._send(prompt)
+            with tracing.span("narrator.parse"):
+                result = self._parse_narrative_response(response.text)
+        else:
+            parser = NarrativeStreamParser(on_text)
+            with tracing.span("narrator.stream") as span:
+                response = self._live_chat().send_message(prompt, stream=True)
+                chunks = []
+                for chunk in response:
+                    if not chunks:
+                        span.set(first_chunk_ms=round(span.elapsed() * 1000, 1))
+                    chunks.append(chunk.text)
+                    parser.feed(chunk.text)
+                result = parser.close()
+                tracing.record_exchange(span, prompt, "".join(chunks), response)
+            self._maintain_history()
+        self.prompt_context.commit()
+        self.last_scene = result[0]
+        return result
+
+    def _forget_repair(self):
+        """
+        修正成功後，把失敗的回應與修正請求從對話歷史移除，只留下原本的請求與修正後的回應。
+        """
+        history = to_serializable(self.chat.history)
+        if len(history) >= 4 and [c["role"] for c in history[-4:]] == ["user", "model", "user", "model"]:
+            history[-4:] = [history[-4], history[-1]]
+            self._start_chat(history)
 
     def _parse_narrative_response(self, response_text):
         """
-        解析來自 AI 的複雜敘述回應，現在能處理動態生成的物品。
+        解析來自 AI 的完整敘述回應，與串流模式共用同一個單次掃描的解析器。
         """
-        try:
-            gp_awarded = 0
-            faith_change = None
-            corruption_change = 0
-            item_received = None
-            skill_received = None # 新增
-            miracle_received = None # 新增
-            new_item_definition = None
-            new_skill_definition = None # 新增
-            new_miracle_definition = None # 新增
-            narrative = ""
-
-            # 1. 優先解析並提取所有「創建」區塊
-            # 創建物品
-            item_def_match = re.search(r"創建物品:\s*(\{.*?\})", response_text, re.DOTALL)
-            if item_def_match:
-                json_str = item_def_match.group(1)
-                try:
-                    new_item_definition = json.loads(json_str)
-                    response_text = response_text.replace(item_def_match.group(0), "")
-                except json.JSONDecodeError as e:
-                    print(f"【錯誤】解析AI創造的物品JSON時發生錯誤：{e}\n原始JSON字串：{json_str}")
-            
-            # 創建技能
-            skill_def_match = re.search(r"創建技能:\s*(\{.*?\})", response_text, re.DOTALL)
-            if skill_def_match:
-                json_str = skill_def_match.group(1)
-                try:
-                    new_skill_definition = json.loads(json_str)
-                    response_text = response_text.replace(skill_def_match.group(0), "")
-                except json.JSONDecodeError as e:
-                    print(f"【錯誤】解析AI創造的技能JSON時發生錯誤：{e}\n原始JSON字串：{json_str}")
-
-            # 創建奇蹟
-            miracle_def_match = re.search(r"創建奇蹟:\s*(\{.*?\})", response_text, re.DOTALL)
-            if miracle_def_match:
-                json_str = miracle_def_match.group(1)
-                try:
-                    new_miracle_definition = json.loads(json_str)
-                    response_text = response_text.replace(miracle_def_match.group(0), "")
-                except json.JSONDecodeError as e:
-                    print(f"【錯誤】解析AI創造的奇蹟JSON時發生錯誤：{e}\n原始JSON字串：{json_str}")
-
-
-            # 2. 逐行解析剩餘的內容
-            lines = response_text.strip().split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if line.startswith("成長點數:"):
-                    gp_awarded = int(line.split(':')[1].strip())
-                elif line.startswith("信仰:"):
-                    parts = line.split(':')[1].strip().split(',')
-                    faith_change = (parts[0].strip(), int(parts[1].strip()))
-                elif line.startswith("腐化:"):
-                    corruption_change = int(line.split(':')[1].strip())
-                elif line.startswith("獲得物品:"):
-                    item_received = line.split(':')[1].strip()
-                elif line.startswith("獲得技能:"):
-                    skill_received = line.split(':')[1].strip()
-                elif line.startswith("獲得奇蹟:"):
-                    miracle_received = line.split(':')[1].strip()
-                elif line.startswith("敘述:"):
-                    narrative = line.split(':', 1)[1].strip()
-                elif "敘述:" not in response_text: # 如果完全沒有敘述標籤，將無法被解析的行視為敘述的一部分
-                    narrative += line + "\n"
-
-            # 如果解析後敘述為空，但原始文本中有內容，則將整個剩餘文本視為敘述
-            if not narrative.strip() and response_text.strip():
-                 # 清理掉可能殘留的標籤
-                clean_text = re.sub(r"^(成長點數|信仰|腐化|獲得物品|獲得技能|獲得奇蹟):.*?\n?", "", response_text, flags=re.MULTILINE).strip()
-                narrative = clean_text
-
-            return narrative, gp_awarded, faith_change, corruption_change, item_received, new_item_definition, skill_received, new_skill_definition, miracle_received, new_miracle_definition
+        return parse_narrative(response_text)
 
-        except Exception as e:
-            print(f"【錯誤】解析AI敘述時發生錯誤：{e}\n原始回應：{response_text}")
-            return response_text, 0, None, 0, None, None, None, None, None, None
     def generate_improvised_character(self, player, world):
         """
         使用 Gemini API 生成一個即興的角色與開場。
@@ -292,7 +614,7 @@ class Narrator:
 開場描述: [遊戲的開場第一段敘述]
 """
         try:
-            response = self.chat.send_message(prompt)
+            response = self._send(prompt)
             lines = response.text.strip().split('\n')
             char_data = {}
             for line in lines:
@@ -309,12 +631,13 @@ class Narrator:
             player.attributes["INT"] = int(char_data.get("智力", 10))
             player.attributes["WIS"] = int(char_data.get("感知", 10))
             player.attributes["CHA"] = int(char_data.get("魅力", 10))
+            player.invalidate_stats()
             player.location = char_data.get("初始地點", "未知的街道")
             opening_line = char_data.get("開場描述", "你在一陣暈眩中醒來，不知身在何處。")
 
             # 根據種族設定初始技能
             if player.race in world.races:
-                player.skills = world.races[player.race].get('skills', [])
+                player.skills = list(world.races[player.race].get('skills', []))
 
             print("\n--- 角色生成完畢 ---")
             print(f"姓名: {player.name}")
@@ -326,6 +649,7 @@ class Narrator:
             print(f"初始技能: {', '.join(player.skills) if player.skills else '無'}")
             print("-" * 20)
             print("\n" + opening_line)
+            self.last_scene = opening_line
 
         except Exception as e:
             print(f"【錯誤】生成即興角色時發生錯誤：{e}。將使用預設角色開始。")
@@ -1,3 +1,4 @@
+import heapq
 import math
 
 class Player:
@@ -15,6 +16,7 @@ class Player:
         }
         self.hp = 100 # Initial placeholder, will be set properly later
         self.active_effects = {} # For temporary effects like buffs/debuffs
+        self.effect_schedule = [] # Min-heap of [expires, attr, source] entries, keyed on world.time
 
         # Equipment slots
         self.equipment = {
@@ -32,6 +34,60 @@ class Player:
         self.corruption = 0
         self.deity = None  # 主要信仰的神祇
 
+        # Cached result of get_total_attributes; see invalidate_stats
+        self._stats_cache = None
+        self._stats_key = None
+        # Cached summary of everything the equipped items provide; see invalidate_equipment
+        self._equipment_aggregate = None
+        self._equipment_key = None
+
+    def to_state(self):
+        """Returns the serializable player state; private caches (leading underscore) are skipped."""
+        return {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
+
+    def invalidate_stats(self):
+        """
+        Marks the cached total attributes as stale. Call after changing base
+        attributes, equipment or active effects; item redefinitions are picked
+        up through world.version.
+        """
+        self._stats_cache = None
+
+    def invalidate_equipment(self):
+        """Marks the equipment aggregate (and the stats derived from it) as stale."""
+        self._equipment_aggregate = None
+        self._stats_cache = None
+
+    def get_equipment_aggregate(self, world):
+        """
+        Returns one summary of all equipped items, rebuilt only after equip/unequip
+        or a world version change:
+        bonus (summed attribute bonuses), abilities, curses and passives
+        ((item_name, passive) pairs). Faith and corruption are applied once per
+        equip/unequip from the item itself, so they are not aggregated here.
+        Callers must not modify the returned structure.
+        """
+        key = (id(world), world.version)
+        if self._equipment_aggregate is None or self._equipment_key != key:
+            aggregate = {"bonus": {}, "abilities": [], "curses": [], "passives": []}
+            for slot, item_name in self.equipment.items():
+                if not item_name:
+                    continue
+                item_details = world.items.get(item_name)
+                if not item_details:
+                    continue
+                for attr, bonus in item_details.get("bonus", {}).items():
+                    aggregate["bonus"][attr] = aggregate["bonus"].get(attr, 0) + bonus
+                if "ability" in item_details:
+                    aggregate["abilities"].append(item_details["ability"])
+                if "curse" in item_details:
+                    aggregate["curses"].append(item_details["curse"])
+                if item_details.get("passive"):
+                    aggregate["passives"].append((item_name, item_details["passive"]))
+            self._equipment_aggregate = aggregate
+            self._equipment_key = key
+        return self._equipment_aggregate
+
     def get_max_hp(self, world):
         """Calculates max HP based on CON."""
         total_con = self.get_total_attributes(world).get("CON", 10)
@@ -77,11 +133,10 @@ class Player:
             used = True
         elif "buff" in effect:
             buff_attrs = effect['buff']
-            duration = buff_attrs.pop("duration", 3)
+            duration = buff_attrs.get("duration", 3)
             for attr, value in buff_attrs.items():
                 if attr in self.attributes:
-                    self.active_effects[attr] = self.active_effects.get(attr, {})
-                    self.active_effects[attr][item_name] = {"bonus": value, "duration": duration}
+                    self.add_effect(attr, item_name, value, duration, world.time)
                     print(f"【系統】你使用了 {item_name}，你的 {attr} 暫時提升了 {value} 點！")
             used = True
 
@@ -90,6 +145,49 @@ class Player:
         else:
             print(f"【系統】你使用了 {item_name}，但似乎沒有任何效果。 (效果 {effect} 尚未實作)")
 
+    def add_effect(self, attr, source, bonus, duration, now):
+        """Adds (or refreshes) a temporary effect that expires `duration` turns after `now`."""
+        expires = now + duration
+        self.active_effects.setdefault(attr, {})[source] = {"bonus": bonus, "expires": expires}
+        heapq.heappush(self.effect_schedule, [expires, attr, source])
+        self.invalidate_stats()
+
+    def pop_expired_effects(self, now):
+        """
+        Removes the effects whose expiry turn has been reached and returns them as
+        (attr, source) pairs. Only the expiring entries are touched; schedule entries
+        left behind by a refreshed effect are discarded when they surface.
+        """
+        expired = []
+        schedule = self.effect_schedule
+        while schedule and schedule[0][0] <= now:
+            expires, attr, source = heapq.heappop(schedule)
+            effects = self.active_effects.get(attr, {})
+            details = effects.get(source)
+            if details is None or details["expires"] != expires:
+                continue
+            del effects[source]
+            if not effects:
+                del self.active_effects[attr]
+            expired.append((attr, source))
+        if expired:
+            self.invalidate_stats()
+        return expired
+
+    def restore_effect_schedule(self, now):
+        """
+        Rebuilds the expiry heap from active_effects after loading a save.
+        Effects from older saves that still count down a `duration` are converted
+        to an absolute expiry turn.
+        """
+        self.effect_schedule = []
+        for attr, effects in self.active_effects.items():
+            for source, details in effects.items():
+                if "expires" not in details:
+                    details["expires"] = now + details.pop("duration", 0)
+                self.effect_schedule.append([details["expires"], attr, source])
+        heapq.heapify(self.effect_schedule)
+
     def equip_item(self, item_name, world):
         """Equips an item from the inventory."""
         if item_name not in self.inventory:
@@ -115,6 +213,7 @@ class Player:
         # Equip the new item
         self.equipment[slot] = item_name
         self.inventory.remove(item_name)
+        self.invalidate_equipment()
         print(f"【系統】你裝備了 {item_name}。")
 
         # Apply ongoing effects
@@ -142,6 +241,7 @@ class Player:
         # Move item back to inventory
         self.inventory.append(item_name) # Use append instead of add_item to avoid the message
         self.equipment[slot] = None
+        self.invalidate_equipment()
         print(f"【系統】你卸下了 {item_name}。")
 
         # Revert ongoing effects
@@ -162,36 +262,30 @@ class Player:
 
     def get_active_abilities(self, world):
         """Gets a list of active abilities from equipped items."""
-        abilities = []
-        for slot, item_name in self.equipment.items():
-            if item_name:
-                item_details = world.items.get(item_name)
-                if item_details and "ability" in item_details:
-                    abilities.append(item_details["ability"])
-        return abilities
+        return list(self.get_equipment_aggregate(world)["abilities"])
 
     def get_curses(self, world):
         """Gets a list of active curses from equipped items."""
-        curses = []
-        for slot, item_name in self.equipment.items():
-            if item_name:
-                item_details = world.items.get(item_name)
-                if item_details and "curse" in item_details:
-                    curses.append(item_details["curse"])
-        return curses
+        return list(self.get_equipment_aggregate(world)["curses"])
 
     def get_total_attributes(self, world):
-        """Calculates total attributes including bonuses from equipment and active effects."""
+        """
+        Calculates total attributes including bonuses from equipment and active effects.
+        The result is cached until invalidate_stats is called or the world version changes.
+        """
+        key = (id(world), world.version) if world else None
+        if self._stats_cache is None or self._stats_key != key:
+            self._stats_cache = self._compute_total_attributes(world)
+            self._stats_key = key
+        return dict(self._stats_cache)
+
+    def _compute_total_attributes(self, world):
         total_attrs = self.attributes.copy()
         if world:
-            for slot, item_name in self.equipment.items():
-                if item_name:
-                    item_details = world.items.get(item_name)
-                    if item_details and "bonus" in item_details:
-                        for attr, bonus in item_details["bonus"].items():
-                            if attr in total_attrs:
-                                total_attrs[attr] += bonus
-        
+            for attr, bonus in self.get_equipment_aggregate(world)["bonus"].items():
+                if attr in total_attrs:
+                    total_attrs[attr] += bonus
+
         for attr, effects in self.active_effects.items():
             for item_name, effect_details in effects.items():
                  total_attrs[attr] += effect_details.get("bonus", 0)
@@ -225,7 +319,7 @@ class Player:
         # 設置玩家種族和技能
         chosen_race = races[choice]
         self.race = chosen_race
-        self.skills = world.races[chosen_race]['skills']
+        self.skills = list(world.races[chosen_race]['skills'])
         print(f"\n你選擇了 {chosen_race}。你的初始技能是：{', '.join(self.skills) if self.skills else '無'}。")
         print("-" * 20)
 
@@ -252,6 +346,7 @@ class Player:
             if attr_choice == '重置':
                 self.attributes = {k: 10 for k in self.attributes}
                 self.attribute_points = 10
+                self.invalidate_stats()
                 print("屬性已重置。")
                 continue
 
@@ -272,6 +367,7 @@ class Player:
                 
                 self.attributes[attr_choice] += points_to_add
                 self.attribute_points -= points_to_add
+                self.invalidate_stats()
 
             except ValueError:
                 print("無效的輸入，請輸入數字。")
@@ -324,8 +420,9 @@ class Player:
             for attr, effects in self.active_effects.items():
                 for item_name, effect_details in effects.items():
                     bonus = effect_details.get('bonus', 0)
-                    duration = effect_details.get('duration', '永久')
-                    print(f"  - {item_name}: {attr} +{bonus} (剩餘 {duration} 回合)")
+                    expires = effect_details.get('expires')
+                    remaining = expires - world.time if expires is not None else '永久'
+                    print(f"  - {item_name}: {attr} +{bonus} (剩餘 {remaining} 回合)")
 
 
         print("\n--- 核心狀態 ---")
@@ -418,6 +515,7 @@ class Player:
             if confirm in ['是', 'yes', 'y']:
                 self.attributes[attr_choice] += 1
                 self.growth_points -= cost
+                self.invalidate_stats()
                 print(f"{attr_choice} 已提升至 {self.attributes[attr_choice]}！")
             else:
                 print("已取消提升。")
@@ -449,27 +547,11 @@ class Player:
             
             learnable = {}
             idx = 1
+            # 玩家技能所屬進化鏈的根技能
+            owned_roots = {world.skill_root(player_skill) for player_skill in self.skills}
             for skill, info in world.skills.items():
                 # 檢查玩家是否已有該技能或其進化版
-                has_skill_in_tree = False
-                for player_skill in self.skills:
-                    # 追溯玩家技能的根技能
-                    base_skill = player_skill
-                    while True:
-                        prev_skill_found = False
-                        for key, value in world.skill_tree.items():
-                            if value['next'] == base_skill:
-                                base_skill = key
-                                prev_skill_found = True
-                                break
-                        if not prev_skill_found:
-                            break
-                    
-                    if base_skill == skill:
-                        has_skill_in_tree = True
-                        break
-
-                if not has_skill_in_tree:
+                if skill not in owned_roots:
                     print(f"{idx}. {skill} - {info['description']} (花費 {info['cost']} GP)")
                     learnable[str(idx)] = {"name": skill, "cost": info['cost']}
                     idx += 1
@@ -0,0 +1,116 @@
+import hashlib
+
+from history import estimate_tokens
+
+# 玩家資訊在單一 prompt 中可使用的 token 上限
+DEFAULT_MAX_TOKENS = 400
+# 超過預算時，單一欄位最少保留的字元數
+_MIN_FIELD_CHARS = 8
+
+_FULL_LABEL = "玩家資訊："
+_DELTA_LABEL = "玩家資訊（僅列出變化，其餘同前）："
+_UNCHANGED = "玩家資訊：與上次相同"
+
+
+def _join(values):
+    return "、".join(str(value) for value in values) if values else "無"
+
+
+def _mapping(values):
+    return "，".join(f"{key} {value}" for key, value in values.items()) if values else "無"
+
+
+def player_snapshot(player, world):
+    """
+    整理敘述 prompt 需要的玩家狀態，回傳 {欄位名稱: 文字} 的有序字典。
+    裝備提供的能力與詛咒只讀取一次裝備彙總。
+    """
+    equipment = player.get_equipment_aggregate(world)
+    return {
+        "姓名": player.name,
+        "種族": player.race,
+        "HP": f"{player.hp}/{player.get_max_hp(world)}",
+        "屬性": _mapping(player.get_total_attributes(world)),
+        "腐化": str(player.corruption),
+        "信仰": _mapping(player.faith),
+        "技能": _join(player.skills),
+        "奇蹟": _join(player.miracles),
+        "特殊能力": _join(equipment["abilities"]),
+        "詛咒": _join(equipment["curses"]),
+    }
+
+
+def _fingerprint(value):
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+
+
+class PromptContext:
+    """
+    產生敘述 prompt 中的玩家資訊。
+
+    對話中第一次送出完整的狀態，之後只送出與模型上次看到的狀態相比有變化的欄位；
+    每個欄位以雜湊值記錄，完全沒有變化時只送出一行說明。
+    對話歷史被壓縮或重新載入後，模型不一定還看得到先前的完整狀態，需呼叫 reset。
+    """
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self._seen = None
+        self._pending = None
+
+    def reset(self):
+        """下一次 build 送出完整狀態。"""
+        self._seen = None
+        self._pending = None
+
+    def build(self, player, world):
+        """
+        回傳這一回合要放進 prompt 的玩家資訊。
+        送出成功後需呼叫 commit，之後的差異才會以這次的狀態為基準。
+        """
+        snapshot = player_snapshot(player, world)
+        fingerprints = {field: _fingerprint(value) for field, value in snapshot.items()}
+        seen = self._seen or {}
+
+        if self._seen is None:
+            text, trimmed = self._fit(_FULL_LABEL, snapshot)
+        else:
+            changed = {field: value for field, value in snapshot.items()
+                       if seen.get(field) != fingerprints[field]}
+            if not changed:
+                self._pending = fingerprints
+                return _UNCHANGED
+            text, trimmed = self._fit(_DELTA_LABEL, changed)
+        # 被截短的欄位模型沒有看到完整內容，保留舊的紀錄，之後會再送出
+        for field in trimmed:
+            fingerprints[field] = seen.get(field)
+        self._pending = fingerprints
+        return text
+
+    def commit(self):
+        """記錄模型已經看到最近一次 build 的內容。"""
+        if self._pending is not None:
+            self._seen = self._pending
+            self._pending = None
+
+    def _fit(self, label, fields):
+        """
+        組合欄位文字；超過 token 預算時，從最長的欄位開始截短。
+        回傳 (文字, 被截短的欄位名稱集合)。
+        """
+        fields = dict(fields)
+        trimmed = set()
+        text = self._render(label, fields)
+        while estimate_tokens(text) > self.max_tokens:
+            field = max(fields, key=lambda name: len(fields[name]))
+            value = fields[field]
+            if len(value) <= _MIN_FIELD_CHARS:
+                break
+            fields[field] = value[:max(len(value) // 2, _MIN_FIELD_CHARS)] + "…"
+            trimmed.add(field)
+            text = self._render(label, fields)
+        return text, trimmed
+
+    @staticmethod
+    def _render(label, fields):
+        return label + "；".join(f"{field}: {value}" for field, value in fields.items())
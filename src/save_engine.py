@@ -0,0 +1,345 @@
+import copy
+import json
+import os
+import queue
+import threading
+
+import history
+
+SAVE_FILE = "savegame.jsonl"
+# 舊版（整份 JSON）存檔，讀取時仍然支援
+LEGACY_SAVE_FILE = "savegame.json"
+# 累積這麼多筆差異紀錄後，重寫成單一檢查點
+COMPACT_EVERY = 50
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _fingerprints(mapping):
+    """每個鍵對應其 JSON 字串，用來比較兩次存檔之間哪些欄位改變了。"""
+    return {key: _dumps(value) for key, value in mapping.items()}
+
+
+class SaveEngine:
+    """
+    增量存檔：存檔檔案是一份只會附加的 JSON Lines 紀錄。
+
+    第一行是完整的檢查點，之後每次存檔只附加與上一次相比的差異：
+    改變的玩家欄位、改變的地點描述、新加入的世界定義與新的對話紀錄。
+    差異累積到 compact_every 筆時，會把目前狀態寫成新的檢查點，
+    並以暫存檔加上 os.replace 原子地取代舊檔。
+    """
+
+    def __init__(self, path=SAVE_FILE, compact_every=COMPACT_EVERY, legacy_path=LEGACY_SAVE_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self._synced = None
+        self._deltas = 0
+        # prepare 在遊戲執行緒上執行，寫入失敗的回報則來自背景執行緒
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path) or bool(self.legacy_path and os.path.exists(self.legacy_path))
+
+    # --- 建立紀錄 ---
+
+    def _snapshot(self, p, w, n):
+        """記錄目前狀態的摘要，作為下次計算差異的基準。"""
+        return {
+            "player": _fingerprints(p.to_state()),
+            "locations": _fingerprints(w.locations),
+            "created": {kind: len(names) for kind, names in w.created.items()},
+            "version": w.version,
+            "time": w.time,
+            "history_len": len(n.chat.history),
+            "compactions": n.history.compactions,
+            "summary": n.history.summary,
+        }
+
+    def checkpoint_record(self, p, w, n):
+        return {
+            "type": "checkpoint",
+            "player": p.to_state(),
+            "world": {
+                "locations": w.locations,
+                "created": w.created_definitions(),
+                "version": w.version,
+                "time": w.time,
+            },
+            "history": history.to_serializable(n.chat.history),
+            "summary": n.history.summary,
+        }
+
+    def delta_record(self, p, w, n):
+        """與上次存檔相比的差異；沒有任何改變時回傳 None。"""
+        synced = self._synced
+        record = {"type": "delta"}
+
+        player_state = p.to_state()
+        changed = {key: value for key, value in player_state.items()
+                   if synced["player"].get(key) != _dumps(value)}
+        if changed:
+            record["player"] = changed
+
+        world_delta = {}
+        locations = {name: entry for name, entry in w.locations.items()
+                     if synced["locations"].get(name) != _dumps(entry)}
+        if locations:
+            world_delta["locations"] = locations
+        removed = [name for name in synced["locations"] if name not in w.locations]
+        if removed:
+            world_delta["removed_locations"] = removed
+        created = {kind: defs for kind, defs in w.created_definitions(synced["created"]).items() if defs}
+        if created:
+            world_delta["created"] = created
+        if w.version != synced["version"]:
+            world_delta["version"] = w.version
+        if w.time != synced["time"]:
+            world_delta["time"] = w.time
+        if world_delta:
+            record["world"] = world_delta
+
+        chat_history = n.chat.history
+        if n.history.compactions != synced["compactions"] or len(chat_history) < synced["history_len"]:
+            # 歷史被壓縮過，舊的紀錄已不適用，整份取代
+            record["history"] = history.to_serializable(chat_history)
+        elif len(chat_history) > synced["history_len"]:
+            record["history_append"] = history.to_serializable(list(chat_history)[synced["history_len"]:])
+        if n.history.summary != synced["summary"]:
+            record["summary"] = n.history.summary
+
+        return record if len(record) > 1 else None
+
+    # --- 寫入 ---
+
+    def prepare(self, p, w, n):
+        """
+        決定這次存檔要寫入的紀錄，並把目前狀態記為已同步。
+        回傳 (紀錄類型, 紀錄)；沒有變化時回傳 (None, None)。
+        紀錄仍引用遊戲中的物件，交給其他執行緒寫入前需要先複製。
+        """
+        with self._lock:
+            if self._synced is None or self._deltas >= self.compact_every:
+                kind, record = "checkpoint", self.checkpoint_record(p, w, n)
+                self._deltas = 0
+            else:
+                record = self.delta_record(p, w, n)
+                if record is None:
+                    return None, None
+                kind = "delta"
+                self._deltas += 1
+            self._synced = self._snapshot(p, w, n)
+            return kind, record
+
+    def mark_unsynced(self):
+        """寫入失敗時呼叫：磁碟上的內容已不是計算差異的基準，下次存檔改寫完整的檢查點。"""
+        with self._lock:
+            self._synced = None
+
+    def write(self, kind, record):
+        """將 prepare 產生的紀錄寫入磁碟。"""
+        if kind == "checkpoint":
+            self.write_checkpoint(record)
+        elif kind == "delta":
+            self.append(record)
+
+    def save(self, p, w, n):
+        """同步存檔，回傳寫入的紀錄類型（"checkpoint"、"delta" 或 None 表示沒有變化）。"""
+        kind, record = self.prepare(p, w, n)
+        try:
+            self.write(kind, record)
+        except Exception:
+            self.mark_unsynced()
+            raise
+        return kind
+
+    def write_checkpoint(self, record):
+        """寫入暫存檔並 fsync 後以 os.replace 原子地取代存檔，中途當機時舊檔保持完整。"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append(self, record):
+        """附加一行差異並 fsync；中途當機最多留下一行不完整的紀錄，讀取時會被略過。"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(_dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # --- 讀取 ---
+
+    def read_state(self):
+        """重播存檔紀錄，回傳合併後的完整狀態；沒有存檔時回傳 None。"""
+        if not os.path.exists(self.path):
+            return self._read_legacy()
+
+        state = None
+        deltas = 0
+        with open(self.path, 'rb') as f:
+            lines = f.readlines()
+        for index, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                if index == len(lines) - 1:
+                    # 寫到一半中斷的最後一筆紀錄：截掉它，之後附加的紀錄才不會接在殘缺的行後面
+                    print("【系統警告】存檔最後一筆紀錄不完整，已略過。")
+                    self._truncate(sum(len(complete) for complete in lines[:index]))
+                    break
+                raise
+            if not line.endswith(b"\n"):
+                # 完整但缺少換行的最後一筆紀錄，補上換行
+                with open(self.path, 'ab') as f:
+                    f.write(b"\n")
+            if record["type"] == "checkpoint":
+                state = record
+                deltas = 0
+            else:
+                self._apply_delta(state, record)
+                deltas += 1
+        self._deltas = deltas
+        return state
+
+    def _truncate(self, size):
+        with open(self.path, 'r+b') as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _apply_delta(state, record):
+        state["player"].update(record.get("player", {}))
+        world_delta = record.get("world", {})
+        locations = state["world"]["locations"]
+        for name in world_delta.get("removed_locations", []):
+            locations.pop(name, None)
+        for name, entry in world_delta.get("locations", {}).items():
+            locations.pop(name, None)
+            locations[name] = entry
+        for kind, defs in world_delta.get("created", {}).items():
+            state["world"]["created"].setdefault(kind, {}).update(defs)
+        for key in ("version", "time"):
+            if key in world_delta:
+                state["world"][key] = world_delta[key]
+        if "history" in record:
+            state["history"] = record["history"]
+        state["history"].extend(record.get("history_append", []))
+        if "summary" in record:
+            state["summary"] = record["summary"]
+
+    def _read_legacy(self):
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return None
+        with open(self.legacy_path, 'r', encoding='utf-8') as f:
+            save_data = json.load(f)
+        return {
+            "type": "checkpoint",
+            "player": save_data["player"],
+            "world": {
+                "locations": save_data["world"].get("locations", {}),
+                # 舊版存檔保存整份物品表，只保留內建定義以外的物品
+                "legacy_items": save_data["world"].get("items", {}),
+                "created": {},
+                "version": save_data["world"].get("version", 0),
+                "time": save_data["world"].get("time", 0),
+            },
+            "history": save_data.get("narrator_history", []),
+            "summary": save_data.get("narrator_summary", ""),
+        }
+
+    def load_into(self, p, w, n):
+        """將存檔內容還原到傳入的物件中，成功時回傳 True。"""
+        state = self.read_state()
+        if state is None:
+            return False
+
+        p.__dict__.update(state["player"])
+        p.invalidate_equipment()
+        world_state = state["world"]
+        w.time = world_state.get("time", 0)
+        p.restore_effect_schedule(w.time)
+        w.locations = world_state["locations"]
+        w.restore_definitions(world_state["created"])
+        legacy_items = world_state.get("legacy_items", {})
+        w.restore_definitions({"items": {name: definition for name, definition in legacy_items.items()
+                                         if name not in w.items}})
+        w.version = world_state["version"]
+        n.restore_history(state["history"], state["summary"])
+
+        if self.path and not os.path.exists(self.path):
+            self._synced = None
+        else:
+            self._synced = self._snapshot(p, w, n)
+        return True
+
+
+class AutosaveWorker:
+    """
+    背景自動存檔。
+
+    submit 在遊戲執行緒上決定要寫入的紀錄並複製一份快照，
+    JSON 序列化、寫檔與 fsync 則交給背景執行緒依序完成，遊戲迴圈不必等待磁碟。
+    """
+
+    _STOP = object()
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._queue = queue.Queue()
+        self._thread = None
+        # 最近一筆紀錄的寫入錯誤；寫入失敗後、下一個檢查點之前的差異都不能再寫入
+        self._error = None
+        self._broken = False
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+
+    def submit(self, p, w, n):
+        """排入一次存檔，回傳紀錄類型（沒有變化時為 None）。"""
+        kind, record = self.engine.prepare(p, w, n)
+        if kind is None:
+            return None
+        self._ensure_started()
+        self._queue.put((kind, copy.deepcopy(record)))
+        return kind
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                kind, record = item
+                if self._broken and kind != "checkpoint":
+                    # 這筆差異的基準沒有寫進存檔，寫入只會留下不一致的紀錄
+                    self._error = "先前的存檔寫入失敗"
+                    continue
+                self.engine.write(kind, record)
+                self._broken = False
+                self._error = None
+            except Exception as e:
+                self._broken = True
+                self._error = str(e)
+                self.engine.mark_unsynced()
+                print(f"【錯誤】自動存檔時發生錯誤：{e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """等待所有已排入的存檔寫入完成，最後一筆紀錄成功寫入（或沒有任何失敗）時回傳 True。"""
+        if self._thread is not None:
+            self._queue.join()
+        return self._error is None
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
@@ -0,0 +1,139 @@
+import json
+import re
+
+# 結構化回應模式使用的 JSON 結構定義（JSON Schema 的子集），
+# 同時放進 Prompt 告訴模型要回傳的格式，並在本地驗證回應。
+
+_CREATION = {
+    "type": "object",
+    "nullable": True,
+    "properties": {
+        "name": {"type": "string"},
+        "definition": {"type": "object", "nullable": True},
+    },
+    "required": ["name"],
+}
+
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "needs_roll": {"type": "boolean"},
+        "num_dice": {"type": "integer", "minimum": 0, "maximum": 5},
+        "target": {"type": "integer", "minimum": 0, "maximum": 100},
+        "reason": {"type": "string"},
+    },
+    "required": ["valid", "needs_roll", "num_dice", "target", "reason"],
+}
+
+NARRATIVE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "narrative": {"type": "string", "minLength": 1},
+        "growth_points": {"type": "integer", "minimum": 0},
+        "faith": {
+            "type": "object",
+            "nullable": True,
+            "properties": {"deity": {"type": "string"}, "change": {"type": "integer"}},
+            "required": ["deity", "change"],
+        },
+        "corruption": {"type": "integer"},
+        "item": _CREATION,
+        "skill": _CREATION,
+        "miracle": _CREATION,
+    },
+    "required": ["narrative"],
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "number": (int, float),
+}
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def describe(schema):
+    """將結構定義轉成放進 Prompt 的精簡 JSON 字串。"""
+    return json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+
+
+def validate(value, schema, path="$"):
+    """依結構定義檢查 value，回傳錯誤訊息列表；沒有錯誤時回傳空列表。"""
+    if value is None:
+        return [] if schema.get("nullable") else [f"{path} 不可為 null"]
+
+    expected = schema.get("type")
+    if expected == "integer":
+        valid_type = isinstance(value, int) and not isinstance(value, bool)
+    elif expected == "number":
+        valid_type = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid_type = expected is None or isinstance(value, _TYPES[expected])
+    if not valid_type:
+        return [f"{path} 應為 {expected}，實際為 {type(value).__name__}"]
+
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path} 必須是 {schema['enum']} 之一")
+    if "minimum" in schema and value < schema["minimum"]:
+        errors.append(f"{path} 不可小於 {schema['minimum']}")
+    if "maximum" in schema and value > schema["maximum"]:
+        errors.append(f"{path} 不可大於 {schema['maximum']}")
+    if "minLength" in schema and len(value) < schema["minLength"]:
+        errors.append(f"{path} 不可為空")
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key} 為必要欄位")
+        properties = schema.get("properties", {})
+        for key, sub_schema in properties.items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{path}.{key}"))
+        extra = schema.get("additionalProperties")
+        if extra is not None:
+            for key in value:
+                if key in properties:
+                    continue
+                if extra is False:
+                    errors.append(f"{path}.{key} 不是允許的欄位")
+                elif isinstance(extra, dict):
+                    errors.extend(validate(value[key], extra, f"{path}.{key}"))
+    elif expected == "array" and "items" in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def parse(text, schema):
+    """解析模型回傳的 JSON 並驗證，不符合時拋出 ValueError（訊息列出所有問題）。"""
+    try:
+        value = json.loads(_FENCE.sub("", text.strip()))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"不是有效的 JSON：{e}") from e
+    errors = validate(value, schema)
+    if errors:
+        raise ValueError("；".join(errors))
+    return value
+
+
+def verdict_tuple(data):
+    """VERDICT_SCHEMA 的資料轉成 evaluate_action 回傳的 (is_valid, reason, needs_roll, num_dice, target)。"""
+    return data["valid"], data["reason"], data["needs_roll"], data["num_dice"], data["target"]
+
+
+def narrative_tuple(data):
+    """NARRATIVE_SCHEMA 的資料轉成與 _parse_narrative_response 相同的 10 元組。"""
+    faith = data.get("faith")
+    result = [
+        data["narrative"].strip(),
+        data.get("growth_points", 0),
+        (faith["deity"], faith["change"]) if faith else None,
+        data.get("corruption", 0),
+    ]
+    for kind in ("item", "skill", "miracle"):
+        creation = data.get(kind) or {}
+        result.extend([creation.get("name") or None, creation.get("definition")])
+    return tuple(result)
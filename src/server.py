@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import io
+import itertools
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog
+import dice
+import game
+import narrator
+import player
+import world
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 同時進行中的回合（也就是同時進行中的 LLM 請求）上限
+DEFAULT_MAX_INFLIGHT = 16
+# 檢查遊戲內容檔案是否變動的間隔（秒），0 表示不自動重新載入
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+class _ThreadLocalStdout:
+    """
+    sys.stdout 的代理：在回合執行緒中設定了緩衝區時，print 的輸出寫入該緩衝區，
+    否則照常寫到原本的 stdout。遊戲邏輯因此不需修改就能分別輸出給每位玩家。
+    同一個行程中的多個伺服器共用一個代理，最後一個關閉的伺服器把 sys.stdout 還原。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+        self.users = 0
+
+    @classmethod
+    def install(cls):
+        if not isinstance(sys.stdout, cls):
+            sys.stdout = cls(sys.stdout)
+        sys.stdout.users += 1
+        return sys.stdout
+
+    def uninstall(self):
+        self.users -= 1
+        if self.users <= 0 and sys.stdout is self:
+            sys.stdout = self._stream
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+
+    def release(self):
+        buffer = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class GameSession:
+    """
+    一位連線玩家的狀態。敘事者在第一次需要 LLM 時才建立。
+    """
+
+    def __init__(self, session_id, narrator_factory, seed=None):
+        self.session_id = session_id
+        # 每個連線獨立的亂數流；伺服器指定 seed 時可依連線編號重現
+        self.dice = dice.DiceEngine(None if seed is None else f"{seed}:{session_id}")
+        self.player = player.Player()
+        self.world = world.World()
+        self.narrator = None
+        self.narrator_factory = narrator_factory
+        self.stage = "name"
+        self.finished = False
+
+    def get_narrator(self):
+        if self.narrator is None:
+            self.narrator = self.narrator_factory()
+        return self.narrator
+
+    def greeting(self):
+        return "歡迎來到這個世界！\n請輸入你的名字："
+
+    def handle_line(self, line):
+        """處理玩家送來的一行輸入，輸出透過 print 取得。"""
+        line = line.strip()
+        # 內容重新載入後，在這個連線的下一個回合開始時才切換，不會打斷進行中的回合
+        self.world.refresh_catalog()
+        if self.stage == "name":
+            self._set_name(line)
+        elif self.stage == "race":
+            self._set_race(line)
+        else:
+            self._play(line)
+
+    def _set_name(self, line):
+        if not line:
+            print("請輸入你的名字：")
+            return
+        self.player.name = line
+        print("\n請選擇你的種族：")
+        for i, race_name in enumerate(self.world.races, start=1):
+            print(f"{i}. {race_name} - {self.world.races[race_name]['description']}")
+        self.stage = "race"
+
+    def _set_race(self, line):
+        races = list(self.world.races)
+        try:
+            choice = int(line) - 1
+        except ValueError:
+            choice = -1
+        if choice < 0 or choice >= len(races):
+            print(f"無效的選擇，請輸入 1-{len(races)}。")
+            return
+        p = self.player
+        p.race = races[choice]
+        p.skills = list(self.world.races[p.race]['skills'])
+        p.hp = p.get_max_hp(self.world)
+        p.location = "台北車站"
+        self.stage = "play"
+        print(f"\n你選擇了 {p.race}。你的冒險從 {p.location} 開始。")
+
+    def _play(self, action):
+        p, w = self.player, self.world
+        action_parts = action.lower().split()
+        command = action_parts[0] if action_parts else ""
+        if not command:
+            return
+        if command in ['離開', 'quit', 'exit']:
+            print("下次再會！")
+            self.finished = True
+            return
+        if command in ['狀態', 'status']:
+            p.show_status(w)
+            return
+        if command in ['成長', 'growth', '存檔', 'save']:
+            print("【系統】伺服器模式尚不支援這個指令。")
+            return
+        if command in ['使用', 'use'] and len(action_parts) > 1:
+            p.use_item(" ".join(action_parts[1:]), w)
+            return
+        if command in ['裝備', 'equip'] and len(action_parts) > 1:
+            p.equip_item(" ".join(action_parts[1:]), w)
+            return
+        if command in ['卸下', 'unequip'] and len(action_parts) > 1:
+            slot_name = action_parts[1]
+            if slot_name in p.equipment:
+                p.unequip_item(slot_name, w)
+            else:
+                print(f"【系統】無效的裝備位置：{slot_name}。有效的為：{', '.join(p.equipment.keys())}")
+            return
+
+        outcome = game.handle_action(action, p, w, self.get_narrator(), dice_engine=self.dice)
+        print(outcome[0])
+        game.apply_action_result(outcome, p, w)
+        game.end_of_turn_effects(p, w)
+        if game.is_game_over(p, w):
+            print("\n--- 遊戲結束 ---")
+            p.show_status(w)
+            self.finished = True
+
+
+class GameServer:
+    """
+    在單一行程中以 asyncio 服務多位玩家的文字協定伺服器（每行一個指令）。
+
+    每個連線對應一個 GameSession；回合在有上限的執行緒池中執行，
+    因此同時進行中的 LLM 請求數固定，閒置的連線只佔用自己的玩家狀態。
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, max_inflight=DEFAULT_MAX_INFLIGHT,
+                 narrator_factory=None, seed=None, reload_interval=0):
+        self.host = host
+        self.seed = seed
+        self.port = port
+        self.narrator_factory = narrator_factory or narrator.Narrator
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="turn")
+        self._server = None
+        self.reload_interval = reload_interval
+        self._watcher = None
+        self._stdout = _ThreadLocalStdout.install()
+        self._closed = False
+
+    def _run_turn(self, session, line):
+        self._stdout.capture()
+        try:
+            session.handle_line(line)
+        except Exception as e:
+            print(f"【錯誤】處理指令時發生錯誤：{e}")
+        return self._stdout.release()
+
+    async def _handle_client(self, reader, writer):
+        session = GameSession(next(self._ids), self.narrator_factory, self.seed)
+        self.sessions[session.session_id] = session
+        loop = asyncio.get_running_loop()
+        try:
+            writer.write((session.greeting() + "\n").encode("utf-8"))
+            await writer.drain()
+            while not session.finished:
+                data = await reader.readline()
+                if not data:
+                    break
+                line = data.decode("utf-8", errors="replace")
+                output = await loop.run_in_executor(self._executor, self._run_turn, session, line)
+                prompt = "" if session.finished or session.stage != "play" else "\n> "
+                writer.write((output + prompt).encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.reload_interval:
+            self._watcher = asyncio.create_task(self._watch_content())
+        return self._server
+
+    async def reload_content(self, force=False):
+        """重新載入遊戲內容檔案；各連線在下一個回合開始時改用新的內容。"""
+        loop = asyncio.get_running_loop()
+        reloaded = await loop.run_in_executor(None, catalog.reload, force)
+        if reloaded:
+            print("【系統】遊戲內容已重新載入。")
+        return reloaded
+
+    async def _watch_content(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_content()
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+        if not self._closed:
+            self._closed = True
+            self._stdout.uninstall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RPG 多人遊戲伺服器")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="同時進行中的回合上限")
+    parser.add_argument("--seed", default=None, help="擲骰亂數種子，用於重現遊戲過程")
+    parser.add_argument("--content-pack", action="append", default=[], metavar="DIR",
+                        help="疊加在基本內容之上的內容包資料夾，可指定多次")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="檢查內容檔案是否變動的間隔秒數，0 表示不自動重新載入")
+    args = parser.parse_args()
+
+    if args.content_pack and not catalog.use_packs(args.content_pack):
+        return
+    server = GameServer(args.host, args.port, args.max_inflight, seed=args.seed,
+                        reload_interval=args.reload_interval)
+    print(f"【系統】伺服器啟動於 {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n【系統】伺服器已關閉。")
+
+
+if __name__ == "__main__":
+    main()
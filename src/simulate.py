@@ -0,0 +1,285 @@
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import dice
+import game
+import history
+import player
+import save_engine
+import world
+
+# 沒有提供腳本時，隨機從這些動作中挑選
+DEFAULT_ACTIONS = [
+    "往前走",
+    "前往西門町",
+    "跟店員說話",
+    "仔細研究牆上的古老塗鴉有什麼含意",
+    "試著撬開上鎖的鐵門",
+    "向路人打聽最近的傳聞",
+    "使用 治療藥水",
+    "裝備 光學迷彩夾克",
+    "狀態",
+    "成長",
+]
+# 成長選單的腳本：提升一次屬性、學習一個技能後離開
+GROWTH_SCRIPT = ["1", "STR", "是", "返回", "2", "1", "1", "是", "返回", "3", "3"]
+
+
+class _Chat:
+    def __init__(self, history=None):
+        self.history = list(history or [])
+
+
+class OfflineNarrator:
+    """
+    不連網、結果固定的敘事者替身，提供 handle_action 與存讀檔需要的介面。
+    latency 為每次「模型呼叫」額外等待的秒數，用來模擬 API 延遲。
+    """
+
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.chat = _Chat()
+        self.history = history.HistoryManager()
+        self.last_scene = ""
+        self.calls = 0
+        self._relics = 0
+
+    def _call(self, prompt, reply):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.chat.history.append({"role": "user", "parts": [prompt]})
+        self.chat.history.append({"role": "model", "parts": [reply]})
+        if self.history.needs_compaction(self.chat.history):
+            self.chat = _Chat(self.history.compact(self.chat.history))
+        self.last_scene = reply
+        return reply
+
+    def restore_history(self, entries, summary=""):
+        self.history.summary = summary
+        self.chat = _Chat(entries)
+        for content in reversed(self.chat.history):
+            if history.content_role(content) == "model":
+                self.last_scene = history.content_text(content)
+                break
+
+    def describe_scene(self, p, w):
+        return self._call(f"描述 {p.location}", f"{p.location} 的街道上人來人往。")
+
+    def evaluate_action(self, action, p, w):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rng.random() < 0.5:
+            return True, "", False, 0, 0
+        num_dice = self.rng.randint(1, 3)
+        return True, "", True, num_dice, self.rng.randint(num_dice, num_dice * 15)
+
+    def _outcome(self, narrative):
+        narrative = self._call(narrative, narrative)
+        roll = self.rng.random()
+        if roll < 0.1:
+            self._relics += 1
+            name = f"模擬遺物{self._relics}"
+            definition = {"type": "神器", "slot": "accessory", "bonus": {"WIS": 1}}
+            return narrative, 1, None, 0, name, definition, None, None, None, None
+        if roll < 0.3:
+            return narrative, 1, ("模擬之神", 1), 0, "治療藥水", None, None, None, None, None
+        return narrative, 2, None, 0, None, None, None, None, None, None
+
+    def get_no_roll_outcome(self, action, p, w, on_text=None):
+        return self._outcome(f"{p.name}{action}，一切順利。")
+
+    def narrate_outcome(self, action, dice_roll, is_success, p, w, on_text=None):
+        verdict = "成功" if is_success else "失敗"
+        return self._outcome(f"{p.name}{action}，擲出 {dice_roll}，{verdict}了。")
+
+    def resolve_action(self, action, p, w):
+        is_valid, reason, needs_roll, num_dice, target = self.evaluate_action(action, p, w)
+        branches = {key: f"敘述: {p.name}{action}（{key}）" for key in ("result", "success", "failure")}
+        return is_valid, reason, needs_roll, num_dice, target, branches
+
+    def choose_branch(self, branches, key):
+        return self._outcome(branches[key])
+
+
+@contextlib.contextmanager
+def scripted_input(answers, limit=1000):
+    """
+    暫時以腳本取代 input()，讓互動選單可以在無人操作時執行。
+    腳本用完後回答「返回」或離開選單，超過 limit 次呼叫視為選單卡住。
+    """
+    answers = iter(answers)
+    calls = [0]
+
+    def fake_input(prompt=""):
+        calls[0] += 1
+        if calls[0] > limit:
+            raise RuntimeError(f"選單沒有結束：{prompt}")
+        answer = next(answers, None)
+        if answer is not None:
+            return answer
+        if "是/否" in prompt:
+            return "否"
+        if "返回" in prompt or "屬性" in prompt:
+            return "返回"
+        return "3"
+
+    original = builtins.input
+    builtins.input = fake_input
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def new_player(w, rng):
+    p = player.Player()
+    p.name = f"模擬者{rng.randint(1, 9999)}"
+    p.race = rng.choice(list(w.races))
+    p.skills = list(w.races[p.race]["skills"])
+    p.inventory = ["治療藥水", "光學迷彩夾克", "戰鬥興奮劑"]
+    p.hp = p.get_max_hp(w)
+    p.location = "台北車站"
+    return p
+
+
+def play_turn(action, p, w, n, dice_engine):
+    """執行一回合，與 game.start_game 的流程相同但不讀取鍵盤輸入。"""
+    action_parts = action.lower().split()
+    command = action_parts[0] if action_parts else ""
+    if command in ['成長', 'growth']:
+        with scripted_input(GROWTH_SCRIPT):
+            p.manage_growth(w)
+        return
+    if command in ['狀態', 'status']:
+        p.show_status(w)
+        return
+    if command in ['使用', 'use'] and len(action_parts) > 1:
+        p.use_item(" ".join(action_parts[1:]), w)
+        return
+    if command in ['裝備', 'equip'] and len(action_parts) > 1:
+        p.equip_item(" ".join(action_parts[1:]), w)
+        return
+
+    outcome = game.handle_action(action, p, w, n, dice_engine=dice_engine)
+    game.apply_action_result(outcome, p, w)
+    game.end_of_turn_effects(p, w)
+
+
+def run_session(turns, latency=0.0, seed=0, script=None, save_path=None, reload_every=10):
+    """
+    執行一個模擬遊戲階段，回傳每回合的耗時（秒）。
+    每回合結束後增量存檔，每 reload_every 回合從存檔重新載入，走過完整的存讀檔流程。
+    """
+    rng = random.Random(seed)
+    engine = save_engine.SaveEngine(save_path, legacy_path=None) if save_path else None
+    w = world.World()
+    n = OfflineNarrator(latency, seed)
+    p = new_player(w, rng)
+    dice_engine = dice.DiceEngine(seed)
+    latencies = []
+
+    for turn in range(turns):
+        action = script[turn % len(script)] if script else rng.choice(DEFAULT_ACTIONS)
+        start = time.perf_counter()
+        play_turn(action, p, w, n, dice_engine)
+        if engine:
+            engine.save(p, w, n)
+            if reload_every and (turn + 1) % reload_every == 0:
+                loaded = game.load_game(lambda: OfflineNarrator(latency, seed), engine)
+                if loaded[0] is not None:
+                    p, w, n = loaded
+        latencies.append(time.perf_counter() - start)
+        if game.is_game_over(p, w):
+            break
+    return latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(fraction * len(ordered)), len(ordered) - 1)
+    return ordered[index]
+
+
+def _run_sessions(sessions, turns, latency, seed, script, save_dir, quiet):
+    latencies = []
+    output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    with output:
+        for session in range(sessions):
+            save_path = os.path.join(save_dir, f"session_{session}.jsonl")
+            latencies.extend(run_session(turns, latency, seed + session, script, save_path))
+    return latencies
+
+
+def simulate(sessions=10, turns=50, latency=0.0, seed=0, script=None, save_dir=None, quiet=True,
+             measure_memory=True):
+    """
+    依序執行多個模擬遊戲階段，回傳效能報告。
+    quiet 為 True 時丟棄遊戲輸出。
+    tracemalloc 會讓每回合慢上數倍，因此延遲在沒有追蹤的一輪中量測；
+    measure_memory 為 True 時再以相同的種子另外跑一輪量測記憶體峰值。
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        latencies = _run_sessions(sessions, turns, latency, seed, script, save_dir or tmp_dir, quiet)
+        elapsed = time.perf_counter() - start
+
+        peak = 0
+        if measure_memory:
+            memory_dir = os.path.join(tmp_dir, "memory")
+            os.makedirs(memory_dir)
+            tracemalloc.start()
+            try:
+                _run_sessions(sessions, turns, latency, seed, script, memory_dir, quiet)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "seconds": elapsed,
+        "turns_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以離線敘事者執行無介面的遊戲模擬")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次模擬模型呼叫的延遲（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--script", help="動作腳本檔案，每行一個動作")
+    parser.add_argument("--save-dir", help="保留模擬存檔的資料夾")
+    parser.add_argument("--no-memory", action="store_true", help="不另外執行一輪量測記憶體峰值")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = [line.strip() for line in f if line.strip()]
+
+    report = simulate(args.sessions, args.turns, args.latency, args.seed, script, args.save_dir,
+                      measure_memory=not args.no_memory)
+    print(f"【系統】模擬 {report['sessions']} 個階段，共 {report['turns']} 回合，耗時 {report['seconds']:.2f} 秒")
+    print(f"每秒回合數：{report['turns_per_sec']:.1f}")
+    print(f"回合延遲 p50：{report['p50_ms']:.2f} ms，p99：{report['p99_ms']:.2f} ms")
+    if not args.no_memory:
+        print(f"記憶體峰值：{report['peak_memory_kb']:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
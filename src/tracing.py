@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+
+import history
+
+
+class _NoopSpan:
+    """未啟用追蹤時使用的空區段，進出與設定屬性都不做任何事。"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def elapsed(self):
+        return 0.0
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """
+    一段計時的處理階段。在 with 區塊中建立的區段會成為目前區段的子區段，
+    沒有父區段時開始一條新的追蹤（例如一個回合）。
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.duration = 0.0
+        self.error = None
+        self._start = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def elapsed(self):
+        """區段開始至今的秒數。"""
+        return time.perf_counter() - self._start
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        if stack:
+            parent = stack[-1]
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        else:
+            self.trace_id = os.urandom(16).hex()
+        stack.append(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        if exc is not None:
+            self.error = repr(exc)
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class JsonlExporter:
+    """每個結束的區段寫成檔案中的一行 JSON。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter:
+    """
+    以 OTLP/HTTP JSON 格式把區段批次送到 OpenTelemetry 相容的收集器
+    （例如 http://localhost:4318），不需要安裝 OpenTelemetry SDK。
+    送出在背景執行緒中進行，不會拖慢遊戲迴圈。
+    """
+
+    def __init__(self, endpoint, service_name="rpg-game", batch_size=64, timeout=2):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._batch = []
+        self._threads = []
+        self._warned = False
+
+    def export(self, span):
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) < self.batch_size:
+                return
+            batch, self._batch = self._batch, []
+        self._send_in_background(batch)
+
+    def _payload(self, spans):
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)}
+                               for key, value in span.attributes.items()],
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            if span.error:
+                otlp_span["status"] = {"code": 2, "message": span.error}
+            otlp_spans.append(otlp_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+        }]}
+
+    def _post(self, spans):
+        import urllib.request  # 只有匯出 OTLP 時才需要
+        data = json.dumps(self._payload(spans)).encode("utf-8")
+        request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            if not self._warned:
+                self._warned = True
+                print(f"【系統警告】無法傳送追蹤資料到 {self.url}：{e}")
+
+    def _send_in_background(self, spans):
+        thread = threading.Thread(target=self._post, args=(spans,), name="otlp-export", daemon=True)
+        self._threads = [t for t in self._threads if t.is_alive()]
+        self._threads.append(thread)
+        thread.start()
+
+    def shutdown(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self._send_in_background(batch)
+        for thread in self._threads:
+            thread.join(self.timeout)
+
+
+class Tracer:
+    """
+    收集處理階段的區段。預設不啟用，此時 span() 回傳共用的空區段，幾乎沒有額外成本。
+    啟用後每個區段會累計到各階段的統計，並交給設定的匯出器。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.exporters = []
+        self.stats = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def configure(self, jsonl_path=None, otlp_endpoint=None, enabled=True):
+        if jsonl_path:
+            self.exporters.append(JsonlExporter(jsonl_path))
+        if otlp_endpoint:
+            self.exporters.append(OtlpExporter(otlp_endpoint))
+        self.enabled = enabled or bool(self.exporters)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, attributes)
+
+    def _finish(self, span):
+        with self._lock:
+            count, total, longest = self.stats.get(span.name, (0, 0.0, 0.0))
+            self.stats[span.name] = (count + 1, total + span.duration, max(longest, span.duration))
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def report(self):
+        """各階段的次數與耗時表，依總耗時排序。"""
+        if not self.stats:
+            return "（沒有記錄到任何區段）"
+        lines = [f"{'階段':<28}{'次數':>6}{'總計(ms)':>12}{'平均(ms)':>12}{'最長(ms)':>12}"]
+        for name, (count, total, longest) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<28}{count:>6}{total * 1000:>12.1f}{total / count * 1000:>12.1f}{longest * 1000:>12.1f}")
+        return "\n".join(lines)
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters = []
+
+
+TRACER = Tracer()
+
+
+def span(name, **attributes):
+    """在全域追蹤器上開始一個區段：with tracing.span("turn") as s: ..."""
+    return TRACER.span(name, **attributes)
+
+
+def record_exchange(current_span, prompt, response_text, response=None):
+    """
+    在區段上記錄一次模型呼叫的提示與回應大小。
+    回應帶有 usage_metadata 時使用實際 token 數，否則以本地估計代替。
+    """
+    if current_span is _NOOP:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    current_span.set(
+        prompt_chars=len(prompt),
+        response_chars=len(response_text),
+        prompt_tokens=prompt_tokens if prompt_tokens is not None else history.estimate_tokens(prompt),
+        response_tokens=response_tokens if response_tokens is not None else history.estimate_tokens(response_text),
+    )
@@ -0,0 +1,63 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import contextlib
+import io
+
+import pytest
+
+from src import player, world
+
+HUGE_ITEMS = 10000
+HUGE_SKILL_CHAINS = 100
+HUGE_CHAIN_LENGTH = 10
+
+
+@pytest.fixture
+def small_world():
+    return world.World()
+
+
+@pytest.fixture(scope="session")
+def _huge_world_template():
+    """一萬件動態創造的物品，加上一千個節點的技能進化樹。只建立一次，測試使用 huge_world 的複本。"""
+    w = world.World()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(HUGE_ITEMS):
+            w.add_item_definition(f"遺物{i}", {
+                "type": "神器", "slot": "accessory", "description": f"第 {i} 件遺物",
+                "bonus": {"WIS": 1}, "ability": f"遺物之力{i}",
+            })
+        for chain in range(HUGE_SKILL_CHAINS):
+            w.add_skill_definition(f"秘術{chain}-0", {"description": f"第 {chain} 系秘術", "cost": 2})
+            for level in range(HUGE_CHAIN_LENGTH - 1):
+                w.add_skill_evolution(f"秘術{chain}-{level}", f"秘術{chain}-{level + 1}", level + 2)
+    return w
+
+
+@pytest.fixture
+def huge_world(_huge_world_template):
+    """
+    每個測試各自的大型世界複本；測試會推進時間或加入效果，
+    共用同一個世界會讓量測結果取決於測試的執行順序。
+    """
+    w = world.World()
+    w.restore_definitions(_huge_world_template.created_definitions())
+    w.version = _huge_world_template.version
+    return w
+
+
+@pytest.fixture
+def equipped_player(huge_world):
+    p = player.Player()
+    p.name = "測試者"
+    p.race = "人類"
+    p.skills = [f"秘術{chain}-{chain % HUGE_CHAIN_LENGTH}" for chain in range(0, HUGE_SKILL_CHAINS, 2)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        p.inventory = ["遺物1", "遺物2"]
+        p.equip_item("遺物1", huge_world)
+        p.equip_item("遺物2", huge_world)
+    return p
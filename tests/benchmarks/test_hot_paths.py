@@ -0,0 +1,97 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import types
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+try:
+    import narrator
+except ImportError:
+    # 沒有 Gemini 相關套件時只略過解析器的基準
+    narrator = types.ModuleType("narrator")
+    narrator.Narrator = object
+    sys.modules["narrator"] = narrator
+
+from src import game, save_engine, simulate
+
+NARRATIVE_PAYLOAD = """成長點數: 2
+信仰: 月神, +1
+腐化: 0
+獲得物品: 月影短刃
+創建物品:
+{
+    "type": "神器",
+    "slot": "weapon",
+    "description": "在月光下會發出微光的短刃，刃身刻有古老的祈禱文。",
+    "bonus": { "DEX": 2, "WIS": 1 },
+    "ability": "月光斬：在夜晚攻擊時造成額外傷害"
+}
+敘述: 你在廢棄神社的祭壇下找到一把短刃。當你握住刀柄時，一股清涼的力量從掌心流入全身，遠方傳來低沉的鐘聲，彷彿有什麼存在注意到了你。"""
+
+
+def test_total_attributes_cached(benchmark, huge_world, equipped_player):
+    benchmark(equipped_player.get_total_attributes, huge_world)
+
+
+def test_total_attributes_recomputed(benchmark, huge_world, equipped_player):
+    def recompute():
+        equipped_player.invalidate_equipment()
+        return equipped_player.get_total_attributes(huge_world)
+    benchmark(recompute)
+
+
+def test_learn_new_skill_listing(benchmark, huge_world, equipped_player):
+    def listing():
+        with simulate.scripted_input(["返回"]):
+            equipped_player.learn_new_skill(huge_world)
+    benchmark(listing)
+
+
+def test_end_of_turn_effects(benchmark, huge_world, equipped_player):
+    for i in range(1000):
+        equipped_player.add_effect("STR", f"祝福{i}", 1, 10 ** 9, huge_world.time)
+    benchmark(game.end_of_turn_effects, equipped_player, huge_world)
+
+
+def test_parse_narrative_response(benchmark):
+    if not hasattr(narrator.Narrator, "_parse_narrative_response"):
+        pytest.skip("narrator 模組無法載入")
+    n = narrator.Narrator.__new__(narrator.Narrator)
+    result = benchmark(n._parse_narrative_response, NARRATIVE_PAYLOAD)
+    assert result[1] == 2
+
+
+def _saved_game(huge_world, equipped_player, path):
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    n = simulate.OfflineNarrator()
+    for turn in range(40):
+        n.get_no_roll_outcome(f"第 {turn} 回合的行動", equipped_player, huge_world)
+    engine.save(equipped_player, huge_world, n)
+    return engine, n
+
+
+def test_save_checkpoint(benchmark, huge_world, equipped_player, tmp_path):
+    engine, n = _saved_game(huge_world, equipped_player, str(tmp_path / "save.jsonl"))
+    benchmark(lambda: engine.write_checkpoint(engine.checkpoint_record(equipped_player, huge_world, n)))
+
+
+def test_save_delta(benchmark, huge_world, equipped_player, tmp_path):
+    engine, n = _saved_game(huge_world, equipped_player, str(tmp_path / "save.jsonl"))
+    engine.compact_every = 10 ** 9
+
+    def save_turn():
+        equipped_player.growth_points += 1
+        return engine.save(equipped_player, huge_world, n)
+    assert benchmark(save_turn) == "delta"
+
+
+def test_load_game(benchmark, huge_world, equipped_player, tmp_path):
+    engine, _ = _saved_game(huge_world, equipped_player, str(tmp_path / "save.jsonl"))
+    p, w, n = benchmark(game.load_game, simulate.OfflineNarrator, engine)
+    assert w.version == huge_world.version
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+# 效能基準（tests/benchmarks）的設定；放在 tests/ 底下，讓 pytest 在 pytest-benchmark 初始化之前載入。
+# 一般執行 pytest 時不跑效能基準，也不寫入 .benchmarks/：
+#   pytest tests/benchmarks --benchmarks                                 執行效能基準
+#   pytest tests/benchmarks --benchmarks --benchmark-save=baseline       在基準提交上儲存比較對象
+#   pytest tests/benchmarks --benchmark-gate=baseline                    與同一台機器上儲存的 baseline 比較
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+# 與比較對象相比，最短耗時變慢超過這個比例時測試失敗；
+# 微秒級的基準平均值在兩次執行之間就會差到 25% 以上，最短耗時較不受雜訊影響
+BENCHMARK_COMPARE_FAIL = "min:25%"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--benchmarks", action="store_true", default=False,
+                    help="執行 tests/benchmarks 中的效能基準（預設略過）")
+    group.addoption("--benchmark-gate", metavar="NAME", default=None,
+                    help="執行效能基準，並與本機儲存、名稱符合 NAME 的結果比較，"
+                         f"變慢超過 {BENCHMARK_COMPARE_FAIL} 時失敗")
+
+
+def pytest_configure(config):
+    gate = config.getoption("benchmark_gate")
+    if gate is None:
+        return
+    if not config.pluginmanager.hasplugin("benchmark"):
+        raise pytest.UsageError("--benchmark-gate 需要安裝 pytest-benchmark")
+    from pytest_benchmark.utils import parse_compare_fail
+
+    option = config.option
+    # 只與明確指定的比較對象比較；pytest-benchmark 的檔案儲存依機器分資料夾，不會拿到其他機器的結果。
+    # 儲存的檔名是「編號_名稱.json」，名稱不是編號時轉成對應的檔名樣式
+    option.benchmark_compare = gate if gate.isdigit() else f"[0-9][0-9][0-9][0-9]_{gate}"
+    if not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [parse_compare_fail(BENCHMARK_COMPARE_FAIL)]
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("benchmarks") or config.getoption("benchmark_gate") is not None:
+        return
+    skip = pytest.mark.skip(reason="效能基準預設不執行，使用 --benchmarks 或 --benchmark-gate 執行")
+    for item in items:
+        if str(item.path).startswith(BENCHMARK_DIR + os.sep):
+            item.add_marker(skip)
@@ -0,0 +1,67 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src import action_rules, player, world
+
+
+def make_player():
+    p = player.Player()
+    p.skills = ["急救"]
+    return p
+
+
+def test_trivial_actions_are_decided_locally():
+    classifier = action_rules.ActionClassifier()
+    w = world.World()
+    p = make_player()
+    assert classifier.classify("走進車站大廳", p, w) == (True, "", False, 0, 0)
+    assert classifier.classify("向站務員問路", p, w)[:3] == (True, "", False)
+    assert classifier.classify("環顧四周", p, w)[0]
+
+
+def test_obvious_rejections_reference_world_skills_and_abilities():
+    classifier = action_rules.ActionClassifier()
+    w = world.World()
+    p = make_player()
+    is_valid, reason, needs_roll, _, _ = classifier.classify("施展火球術", p, w)
+    assert not is_valid and not needs_roll
+    assert "火球術" in reason
+    assert not classifier.classify("發動夜視", p, w)[0]
+
+    p.inventory = ["夜視鏡"]
+    p.equip_item("夜視鏡", w)
+    assert classifier.classify("發動夜視", p, w) is None
+
+
+def test_ambiguous_actions_escalate():
+    classifier = action_rules.ActionClassifier()
+    w = world.World()
+    p = make_player()
+    assert classifier.classify("說服守衛讓我進去", p, w) is None
+    assert classifier.classify("使用急救替路人止血", p, w) is None
+    assert classifier.classify("看準時機偷走他的錢包", p, w) is None
+    # 移動動詞開頭的複合詞或附帶其他動作時，仍交給 GM 判定
+    assert classifier.classify("走私一批武器進城", p, w) is None
+    assert classifier.classify("坐車撞向守衛", p, w) is None
+    assert classifier.classify("去車站，然後放火", p, w) is None
+
+
+def test_rule_patterns_are_compiled_once_per_name_set(monkeypatch):
+    table = action_rules.RuleTable.from_file()
+    compiled = []
+    original = table._compile
+    monkeypatch.setattr(table, "_compile", lambda pattern, values: compiled.append(pattern) or original(pattern, values))
+    w = world.World()
+    p = make_player()
+    table("施展火球術", p, w)
+    count = len(compiled)
+    assert count > 0
+    table("施展火球術", p, w)
+    assert len(compiled) == count
+
+    p.skills.append("火球術")
+    assert table("施展火球術", p, w)[0] == "escalate"
+    assert len(compiled) > count
@@ -0,0 +1,87 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import asyncio
+import threading
+import time
+
+from src import async_narrator, location_cache, player, world
+
+
+class StubNarrator:
+    def __init__(self, path, gate=None):
+        self.location_cache = location_cache.LocationCache(path)
+        self.gate = gate
+        self.fetched = []
+
+    def fetch_location_description(self, location_name):
+        if self.gate:
+            self.gate.wait()
+        self.fetched.append(location_name)
+        return f"{location_name}的描述"
+
+    def evaluate_action(self, action, p, w):
+        return True, "", False, 0, 0
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_prefetch_warms_location_cache(tmp_path):
+    n = StubNarrator(str(tmp_path / "locations.json"))
+    scheduler = async_narrator.PrefetchScheduler(n, per_turn=2)
+    w = world.World()
+    p = player.Player()
+    p.location = "台北車站"
+    try:
+        text = "你離開台北車站，決定前往西門町夜市，再到龍山寺，最後去淡水老街。"
+        assert scheduler.schedule(text, p, w) == ["西門町夜市", "龍山寺"]
+        wait_for(lambda: len(n.fetched) == 2)
+        wait_for(lambda: not scheduler._pending)
+        assert sorted(scheduler.drain(w)) == ["西門町夜市", "龍山寺"]
+        assert w.locations["龍山寺"]["description"] == "龍山寺的描述"
+        # 已快取的地點不會再次請求
+        assert scheduler.schedule(text, p, w) == ["淡水老街"]
+    finally:
+        scheduler.close()
+
+
+def test_cancel_drops_queued_requests_and_refunds_budget(tmp_path):
+    gate = threading.Event()
+    n = StubNarrator(str(tmp_path / "locations.json"), gate)
+    scheduler = async_narrator.PrefetchScheduler(n, per_turn=3, total=3, concurrency=1)
+    w = world.World()
+    p = player.Player()
+    try:
+        scheduler.schedule("前往西門町夜市，再到龍山寺，最後去淡水老街。", p, w)
+        wait_for(lambda: any(state["started"] for state in scheduler._pending.values()))
+        assert len(scheduler.cancel()) == 2
+        assert scheduler.requested == 1
+        gate.set()
+        wait_for(lambda: len(n.fetched) == 1)
+        wait_for(lambda: not scheduler._pending)
+        assert scheduler.drain(w) == ["西門町夜市"]
+        assert n.fetched == ["西門町夜市"]
+    finally:
+        scheduler.close()
+
+
+def test_async_narrator_mirrors_sync_methods(tmp_path):
+    n = StubNarrator(str(tmp_path / "locations.json"))
+    an = async_narrator.AsyncNarrator(n)
+
+    async def run():
+        return await asyncio.gather(
+            an.evaluate_action("走進車站", None, None),
+            an.fetch_location_description("台北車站"),
+        )
+
+    verdict, description = asyncio.run(run())
+    assert verdict == (True, "", False, 0, 0)
+    assert description == "台北車站的描述"
@@ -0,0 +1,104 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import json
+import shutil
+
+import pytest
+from src import world
+
+# World 使用的是以頂層名稱匯入的 catalog 模組
+catalog = world.catalog
+
+
+def write_pack(directory, kind, table):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{kind}.json"), 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    for kind in catalog.KINDS:
+        shutil.copy(os.path.join(catalog.DATA_DIR, f"{kind}.json"), directory)
+    return str(directory)
+
+
+def test_builtin_data_files_are_valid():
+    data, _ = catalog.parse_files(catalog.source_files([catalog.DATA_DIR]))
+    assert "治療藥水" in data["items"]
+    assert data["skill_tree"]["駭客術"] == {"next": "資料探勘", "cost": 3}
+
+
+def test_warm_start_uses_cache_until_content_changes(data_dir, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "cache" / "catalog.pickle")
+    cold = catalog.load([data_dir], cache_file)
+    assert os.path.exists(cache_file)
+
+    def fail(files):
+        raise AssertionError("不應重新解析")
+
+    with monkeypatch.context() as m:
+        m.setattr(catalog, "parse_files", fail)
+        assert dict(catalog.load([data_dir], cache_file).items) == dict(cold.items)
+        # 只更新修改時間、內容沒變時比對雜湊後沿用快取
+        path = os.path.join(data_dir, "items.json")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        catalog.load([data_dir], cache_file)
+
+    write_pack(data_dir, "miracles", {"月之守護": {"deity": "月神", "description": "月光形成護盾。"}})
+    assert set(catalog.load([data_dir], cache_file).miracles) == {"月之守護"}
+
+
+def test_invalid_pack_lists_problems(data_dir, tmp_path):
+    pack = str(tmp_path / "pack")
+    write_pack(pack, "items", {"壞掉的手套": {"type": "一般裝備", "slot": "hand", "description": "？"}})
+    with pytest.raises(ValueError) as excinfo:
+        catalog.load([data_dir, pack], None)
+    message = str(excinfo.value)
+    assert "items.壞掉的手套.slot" in message
+    assert "items.json" in message
+
+
+def test_cyclic_skill_tree_pack_is_rejected(data_dir, tmp_path):
+    pack = str(tmp_path / "cycle")
+    write_pack(pack, "skill_tree", {"資料探勘": {"next": "駭客術", "cost": 1}})
+    with pytest.raises(ValueError) as excinfo:
+        catalog.load([data_dir, pack], None)
+    assert "循環" in str(excinfo.value)
+
+    pack = str(tmp_path / "two_parents")
+    write_pack(pack, "skill_tree", {"說服": {"next": "資料探勘", "cost": 1}})
+    with pytest.raises(ValueError) as excinfo:
+        catalog.load([data_dir, pack], None)
+    assert "多個進化來源" in str(excinfo.value)
+
+
+def test_hot_reload_keeps_created_definitions(data_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "DATA_DIR", data_dir)
+    monkeypatch.setattr(catalog, "CACHE_FILE", str(tmp_path / "catalog.pickle"))
+    monkeypatch.setattr(catalog, "_pack_dirs", [])
+    monkeypatch.setattr(catalog, "_current", None)
+    w = world.World()
+    w.add_item_definition("月影短刃", {"type": "武器", "slot": "weapon"})
+    assert not catalog.reload()
+
+    pack = str(tmp_path / "pack")
+    write_pack(pack, "items", {"霓虹披風": {"type": "一般裝備", "slot": "torso", "description": "會發光的披風。"}})
+    assert catalog.use_packs([pack])
+    version = w.version
+    assert w.refresh_catalog()
+    assert "霓虹披風" in w.items and "月影短刃" in w.items and "治療藥水" in w.items
+    assert w.version > version
+    assert not w.refresh_catalog()
+
+    # 無效的內容不會取代目前的目錄
+    write_pack(pack, "items", {"霓虹披風": {"type": "一般裝備"}})
+    assert not catalog.reload()
+    assert catalog.current() is w.catalog
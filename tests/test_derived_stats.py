@@ -0,0 +1,81 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import types
+
+if "narrator" not in sys.modules:
+    fake = types.ModuleType("narrator")
+    fake.Narrator = object
+    sys.modules["narrator"] = fake
+
+from src import player, world, game
+
+
+def test_total_attributes_follow_relevant_mutations():
+    w = world.World()
+    p = player.Player()
+    assert p.get_total_attributes(w)["DEX"] == 10
+
+    p.inventory = ["光學迷彩夾克", "戰鬥興奮劑"]
+    p.equip_item("光學迷彩夾克", w)
+    assert p.get_total_attributes(w)["DEX"] == 11
+
+    p.use_item("戰鬥興奮劑", w)
+    assert p.get_total_attributes(w)["DEX"] == 13
+
+    for _ in range(3):
+        game.end_of_turn_effects(p, w)
+    assert p.get_total_attributes(w)["DEX"] == 11
+
+    # 物品被重新定義時透過 world.version 失效
+    w.items["光學迷彩夾克"] = dict(w.items["光學迷彩夾克"], bonus={"DEX": 4})
+    w.version += 1
+    assert p.get_total_attributes(w)["DEX"] == 14
+
+    p.unequip_item("torso", w)
+    assert p.get_total_attributes(w)["DEX"] == 10
+
+
+def test_cached_result_is_not_shared_with_callers():
+    w = world.World()
+    p = player.Player()
+    p.get_total_attributes(w)["STR"] = 99
+    assert p.get_total_attributes(w)["STR"] == 10
+
+
+def test_equipment_aggregate_is_rebuilt_only_on_equipment_change():
+    w = world.World()
+    p = player.Player()
+    p.inventory = ["光學迷彩夾克"]
+    p.equip_item("光學迷彩夾克", w)
+    aggregate = p.get_equipment_aggregate(w)
+    assert aggregate["bonus"] == w.items["光學迷彩夾克"]["bonus"]
+    assert p.get_equipment_aggregate(w) is aggregate
+
+    # 只改變基礎屬性時不需要重建
+    p.attributes["STR"] += 1
+    p.invalidate_stats()
+    assert p.get_equipment_aggregate(w) is aggregate
+
+    p.unequip_item("torso", w)
+    assert p.get_equipment_aggregate(w)["bonus"] == {}
+    assert p.get_active_abilities(w) == [] and p.get_curses(w) == []
+
+
+def test_effects_expire_on_schedule_and_refresh():
+    w = world.World()
+    p = player.Player()
+    p.add_effect("STR", "戰吼", 2, 2, w.time)
+    game.end_of_turn_effects(p, w)
+    # 重新施加時延長到期回合，舊的排程項目不會提早移除效果
+    p.add_effect("STR", "戰吼", 2, 2, w.time)
+    game.end_of_turn_effects(p, w)
+    assert p.get_total_attributes(w)["STR"] == 12
+    game.end_of_turn_effects(p, w)
+    assert p.active_effects == {}
+    assert p.get_total_attributes(w)["STR"] == 10
+    # 物品定義不會被使用時修改
+    assert w.items["戰鬥興奮劑"]["effect"]["buff"]["duration"] == 3
@@ -0,0 +1,33 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src import dice
+
+
+def test_exact_distribution():
+    counts = dice.distribution(2)
+    assert sum(counts) == 20 ** 2
+    assert counts[21] == 20 and counts[2] == 1 and counts[40] == 1
+    assert sum(dice.distribution(5)) == 20 ** 5
+    assert dice.success_probability(1, 11) == 0.5
+    assert dice.success_probability(3, 3) == 1.0
+    assert dice.success_probability(2, 41) == 0.0
+    # 超過上限的骰子數以 MAX_DICE 計算
+    assert dice.success_probability(9, 50) == dice.success_probability(5, 50)
+
+
+def test_seeded_engines_are_reproducible():
+    a, b = dice.DiceEngine(seed=7), dice.DiceEngine(seed=7)
+    assert [a.roll(3) for _ in range(5)] == [b.roll(3) for _ in range(5)]
+    assert list(a.roll_batch(2, 10)) == list(b.roll_batch(2, 10))
+    faces = a.roll(9)
+    assert len(faces) == 5 and all(1 <= face <= 20 for face in faces)
+
+
+def test_monte_carlo_estimate_matches_exact_probability():
+    engine = dice.DiceEngine(seed=1)
+    exact = dice.success_probability(3, 35)
+    assert abs(engine.estimate_success(3, 35, trials=20000) - exact) < 0.02
@@ -0,0 +1,48 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import types
+
+if "narrator" not in sys.modules:
+    fake = types.ModuleType("narrator")
+    fake.Narrator = object
+    sys.modules["narrator"] = fake
+
+from src import player, world, game
+
+
+class SingleCallNarrator:
+    def __init__(self):
+        self.calls = []
+
+    def resolve_action(self, action, p, w):
+        self.calls.append("resolve")
+        return True, "有難度", True, 1, 10, {"success": "敘述:成功了", "failure": "敘述:失敗了"}
+
+    def choose_branch(self, branches, key):
+        self.calls.append(key)
+        return branches[key], 0, None, 0, None, None, None, None, None, None
+
+
+def test_single_call_resolution_picks_branch_after_local_roll(monkeypatch):
+    monkeypatch.setattr(game, "SINGLE_CALL_RESOLUTION", True)
+    monkeypatch.setattr(game, "roll_dice", lambda num_dice, engine=None: [15])
+    n = SingleCallNarrator()
+    result = game.handle_action("說服守衛讓我進去", player.Player(), world.World(), n)
+    assert result[0] == "敘述:成功了"
+    assert n.calls == ["resolve", "success"]
+
+    monkeypatch.setattr(game, "roll_dice", lambda num_dice, engine=None: [3])
+    result = game.handle_action("說服守衛讓我進去", player.Player(), world.World(), n)
+    assert result[0] == "敘述:失敗了"
+
+
+def test_passing_no_classifier_sends_trivial_actions_to_the_judge(monkeypatch):
+    monkeypatch.setattr(game, "SINGLE_CALL_RESOLUTION", True)
+    monkeypatch.setattr(game, "roll_dice", lambda num_dice, engine=None: [15])
+    n = SingleCallNarrator()
+    game.handle_action("走進車站大廳", player.Player(), world.World(), n, classifier=None)
+    assert n.calls[0] == "resolve"
@@ -0,0 +1,39 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src import history
+
+
+def make_turns(count):
+    turns = []
+    for i in range(count):
+        turns.append({"role": "user", "parts": [f"行動 {i}"]})
+        turns.append({"role": "model", "parts": [f"獲得物品:鑰匙{i}\n敘述:第{i}回合發生了事情。之後還有更多。"]})
+    return turns
+
+
+def test_compaction_keeps_recent_turns_and_summary():
+    manager = history.HistoryManager(max_turns=4, keep_turns=2)
+    turns = make_turns(5)
+    assert manager.needs_compaction(turns)
+
+    compacted = manager.compact(turns)
+    assert compacted[0]["parts"][0].startswith(history.SUMMARY_MARKER)
+    assert compacted[2:] == turns[-4:]
+    assert "第0回合發生了事情。" in manager.summary
+    assert "之後還有更多" not in manager.summary
+    assert "獲得物品:鑰匙2" in manager.summary
+
+
+def test_history_stays_bounded():
+    manager = history.HistoryManager(max_turns=4, keep_turns=2)
+    chat = []
+    for turn in make_turns(50):
+        chat.append(turn)
+        if manager.needs_compaction(chat):
+            chat = manager.compact(chat)
+    assert len(chat) <= 2 + 4 * 2 + 1
+    assert len(manager.summary) <= history.SUMMARY_MAX_CHARS
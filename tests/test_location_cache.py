@@ -0,0 +1,71 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src import location_cache, world
+
+
+def test_lru_eviction_and_disk_backing(tmp_path):
+    path = str(tmp_path / "locations.jsonl")
+    cache = location_cache.LocationCache(path, memory_capacity=2)
+    w = world.World()
+    cache.put("台北車站", "人潮洶湧的車站。", w)
+    cache.put("西門町", "霓虹閃爍的街區。", w)
+    assert cache.get("台北車站", w) == "人潮洶湧的車站。"
+    cache.put("淡水老街", "河岸邊的老街。", w)
+    # 西門町最久未使用，被移出記憶體
+    assert list(w.locations) == ["台北車站", "淡水老街"]
+
+    # 新的世界與新的快取物件仍可從磁碟取得描述
+    fresh_world = world.World()
+    fresh_cache = location_cache.LocationCache(path, memory_capacity=2)
+    assert fresh_cache.get("西門町", fresh_world) == "霓虹閃爍的街區。"
+    assert "西門町" in fresh_world.locations
+
+
+def test_entries_are_keyed_on_content_and_appended(tmp_path):
+    path = str(tmp_path / "locations.jsonl")
+    cache = location_cache.LocationCache(path, context="設定A")
+    w = world.World()
+    cache.put("台北車站", "人潮洶湧的車站。", w)
+    # 遊戲中新增定義不會讓地點描述失效
+    w.add_item_definition("新物品", {"type": "一般裝備"})
+    assert cache.get("台北車站", w) == "人潮洶湧的車站。"
+    cache.put("西門町", "霓虹閃爍的街區。", w)
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+
+    # 世界觀設定不同時不共用描述
+    other = location_cache.LocationCache(path, context="設定B")
+    assert other.get("台北車站", world.World()) is None
+    same = location_cache.LocationCache(path, context="設定A")
+    assert same.get("台北車站", world.World()) == "人潮洶湧的車站。"
+
+
+def test_disk_log_is_compacted(tmp_path):
+    path = str(tmp_path / "locations.jsonl")
+    cache = location_cache.LocationCache(path, disk_capacity=2)
+    w = world.World()
+    for i in range(6):
+        cache.put(f"地點{i}", f"描述{i}", w)
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) <= 4
+    fresh = location_cache.LocationCache(path, disk_capacity=2)
+    assert fresh.get("地點5", world.World()) == "描述5"
+    assert fresh.get("地點0", world.World()) is None
+
+
+def test_player_specific_scenes_stay_in_session(tmp_path):
+    path = str(tmp_path / "locations.jsonl")
+    cache = location_cache.LocationCache(path)
+    w = world.World()
+    cache.put("台北車站", "阿明站在車站大廳。", w, shared=False)
+    assert cache.get("台北車站", w, shared=False) == "阿明站在車站大廳。"
+    assert not os.path.exists(path)
+
+    # 另一場遊戲不會拿到前一位玩家的場景
+    other = location_cache.LocationCache(path)
+    assert other.get("台北車站", world.World(), shared=False) is None
+    assert other.get("台北車站", world.World()) is None
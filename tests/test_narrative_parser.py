@@ -0,0 +1,101 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src.narrative_parser import NarrativeStreamParser
+
+
+RESPONSE = """成長點數:2
+信仰:月神,+3
+獲得物品:月影短刃
+創建物品:
+{
+    "type": "神器",
+    "slot": "weapon",
+    "description": "刀身映著月光。",
+    "bonus": { "DEX": 2 },
+    "ability": "月影"
+}
+敘述:你在月光下拾起一把短刃。
+刀身微微發亮。"""
+
+
+def feed_in_chunks(parser, text, size):
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser.close()
+
+
+def test_stream_parser_headers_and_narrative():
+    streamed = []
+    parser = NarrativeStreamParser(streamed.append)
+    result = feed_in_chunks(parser, RESPONSE, 3)
+    narrative, gp, faith, corruption, item, item_def = result[:6]
+    assert gp == 2
+    assert faith == ("月神", 3)
+    assert corruption == 0
+    assert item == "月影短刃"
+    assert item_def["bonus"] == {"DEX": 2}
+    assert narrative == "你在月光下拾起一把短刃。\n刀身微微發亮。"
+    # 敘述在串流結束前就已逐段送出
+    assert len(streamed) > 1
+    assert "".join(streamed) == narrative
+
+
+def test_stream_parser_without_narrative_label():
+    streamed = []
+    parser = NarrativeStreamParser(streamed.append)
+    result = feed_in_chunks(parser, "腐化:1\n你感到一陣寒意。", 4)
+    assert result[0] == "你感到一陣寒意。"
+    assert result[3] == 1
+    assert "".join(streamed) == "你感到一陣寒意。"
+
+
+def test_whole_response_parse_matches_streamed_parse():
+    from src.narrative_parser import parse_narrative
+    whole = parse_narrative(RESPONSE)
+    for size in (1, 7, 64):
+        assert feed_in_chunks(NarrativeStreamParser(), RESPONSE, size) == whole
+
+
+def test_nested_json_with_braces_in_strings_and_lenient_fields():
+    from src.narrative_parser import parse_narrative
+    text = """成長點數： 3 點
+信仰:月神，-2
+獲得技能:月光步
+創建技能:{"cost": 4, "description": "留下 {月痕} 與 \\"引號\\"", "meta": {"tier": {"level": 2}}}
+創建奇蹟:沒有內容
+敘述:你感覺腳步變輕了。"""
+    result = parse_narrative(text)
+    assert result[1] == 3
+    assert result[2] == ("月神", -2)
+    assert result[6] == "月光步"
+    assert result[7]["description"] == '留下 {月痕} 與 "引號"'
+    assert result[7]["meta"]["tier"]["level"] == 2
+    assert result[9] is None
+    assert result[0] == "你感覺腳步變輕了。"
+
+
+def test_stream_parser_headers_after_narrative():
+    text = """敘述:你推開門。
+門後一片漆黑。
+創建物品:{"type": "神器", "description": "微光石。"}
+腐化: 1
+你聽見低語。"""
+    for size in (1, 2, 5, 100):
+        streamed = []
+        result = feed_in_chunks(NarrativeStreamParser(streamed.append), text, size)
+        assert result[0] == "你推開門。\n門後一片漆黑。\n你聽見低語。"
+        assert result[3] == 1
+        assert result[5] == {"type": "神器", "description": "微光石。"}
+        assert "".join(streamed) == result[0]
+
+
+def test_whole_response_headers_after_narrative():
+    from src.narrative_parser import parse_narrative
+    result = parse_narrative("敘述:你找到了寶物。\n成長點數:2\n獲得物品:月影短刃")
+    assert result[0] == "你找到了寶物。"
+    assert result[1] == 2
+    assert result[4] == "月影短刃"
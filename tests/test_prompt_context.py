@@ -0,0 +1,64 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+from src import player, world
+from src.prompt_context import PromptContext
+
+
+def make_player():
+    p = player.Player()
+    p.name = "阿明"
+    p.race = "人類"
+    p.skills = ["急救"]
+    return p
+
+
+def test_only_changes_are_sent_after_commit():
+    w = world.World()
+    p = make_player()
+    context = PromptContext()
+    first = context.build(p, w)
+    assert first.startswith("玩家資訊：姓名: 阿明；種族: 人類；HP: 100/")
+    assert "技能: 急救" in first and "詛咒: 無" in first
+
+    # 尚未確認送出時，下一次仍然是完整狀態
+    assert context.build(p, w) == first
+    context.commit()
+    assert context.build(p, w) == "玩家資訊：與上次相同"
+    context.commit()
+
+    p.hp = 80
+    p.skills.append("潛行")
+    delta = context.build(p, w)
+    assert delta.startswith("玩家資訊（僅列出變化")
+    assert "HP: 80/" in delta and "技能: 急救、潛行" in delta
+    assert "姓名" not in delta and "屬性" not in delta
+    context.commit()
+
+    context.reset()
+    assert context.build(p, w).startswith("玩家資訊：姓名")
+
+
+def test_token_budget_trims_longest_fields():
+    w = world.World()
+    p = make_player()
+    p.skills = [f"很長很長的技能名稱{i}" for i in range(100)]
+    text = PromptContext(max_tokens=120).build(p, w)
+    assert len(text) < 200
+    assert "技能: 很長很長的技能名稱0" in text and "…" in text
+    assert "姓名: 阿明" in text
+
+
+def test_trimmed_fields_are_sent_again():
+    w = world.World()
+    p = make_player()
+    p.skills = [f"很長很長的技能名稱{i}" for i in range(100)]
+    context = PromptContext(max_tokens=120)
+    context.build(p, w)
+    context.commit()
+    # 技能被截短過，下一回合仍需送出；其他欄位沒有變化
+    text = context.build(p, w)
+    assert "技能:" in text and "姓名" not in text
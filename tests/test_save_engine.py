@@ -0,0 +1,173 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import json
+
+from src import history, player, save_engine, world
+
+
+class StubChat:
+    def __init__(self, history=None):
+        self.history = list(history or [])
+
+
+class StubNarrator:
+    def __init__(self):
+        self.chat = StubChat()
+        self.history = history.HistoryManager()
+
+    def restore_history(self, entries, summary=""):
+        self.history.summary = summary
+        self.chat = StubChat(entries)
+
+
+def make_game():
+    p = player.Player()
+    p.name = "阿明"
+    return p, world.World(), StubNarrator()
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_deltas_only_contain_changes_and_round_trip(tmp_path):
+    path = str(tmp_path / "save.jsonl")
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    p, w, n = make_game()
+    assert engine.save(p, w, n) == "checkpoint"
+    assert engine.save(p, w, n) is None
+
+    p.hp = 42
+    p.add_effect("DEX", "戰鬥興奮劑", 2, 3, w.time)
+    w.time = 2
+    w.add_item_definition("月影短刃", {"type": "神器", "slot": "weapon"})
+    n.chat.history.append({"role": "user", "parts": ["看看四周"]})
+    assert engine.save(p, w, n) == "delta"
+
+    records = read_records(path)
+    assert len(records) == 2
+    delta = records[1]
+    assert set(delta["player"]) == {"hp", "active_effects", "effect_schedule"}
+    assert delta["world"]["time"] == 2
+    assert list(delta["world"]["created"]["items"]) == ["月影短刃"]
+    assert delta["history_append"] == [{"role": "user", "parts": ["看看四周"]}]
+    # 檢查點與差異都不包含內建的物品定義
+    assert "治療藥水" not in json.dumps(records, ensure_ascii=False)
+
+    lp, lw, ln = player.Player(), world.World(), StubNarrator()
+    assert save_engine.SaveEngine(path, legacy_path=None).load_into(lp, lw, ln)
+    assert lp.to_state() == p.to_state()
+    assert lw.items["月影短刃"]["slot"] == "weapon"
+    assert lw.version == w.version and lw.time == 2
+    assert lp.pop_expired_effects(lw.time) == []
+    assert lp.pop_expired_effects(3) == [("DEX", "戰鬥興奮劑")]
+    assert ln.chat.history == n.chat.history
+
+
+def test_compaction_and_torn_record(tmp_path):
+    path = str(tmp_path / "save.jsonl")
+    engine = save_engine.SaveEngine(path, compact_every=3, legacy_path=None)
+    p, w, n = make_game()
+    engine.save(p, w, n)
+    for gp in range(1, 6):
+        p.growth_points = gp
+        engine.save(p, w, n)
+    records = read_records(path)
+    assert [r["type"] for r in records] == ["checkpoint", "delta"]
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "delta", "player": {"hp"')
+    lp, lw, ln = player.Player(), world.World(), StubNarrator()
+    assert save_engine.SaveEngine(path, legacy_path=None).load_into(lp, lw, ln)
+    assert lp.growth_points == 5
+
+
+def test_saves_after_torn_record_survive_reload(tmp_path):
+    path = str(tmp_path / "save.jsonl")
+    p, w, n = make_game()
+    save_engine.SaveEngine(path, legacy_path=None).save(p, w, n)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "delta", "player": {"hp"')
+
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    lp, lw, ln = player.Player(), world.World(), StubNarrator()
+    assert engine.load_into(lp, lw, ln)
+    lp.hp = 50
+    assert engine.save(lp, lw, ln) == "delta"
+    lp.growth_points = 3
+    assert engine.save(lp, lw, ln) == "delta"
+
+    rp, rw, rn = player.Player(), world.World(), StubNarrator()
+    assert save_engine.SaveEngine(path, legacy_path=None).load_into(rp, rw, rn)
+    assert rp.hp == 50 and rp.growth_points == 3
+    assert len(read_records(path)) == 3
+
+
+def test_autosave_worker_writes_in_background(tmp_path):
+    path = str(tmp_path / "save.jsonl")
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    worker = save_engine.AutosaveWorker(engine)
+    p, w, n = make_game()
+    try:
+        assert worker.submit(p, w, n) == "checkpoint"
+        p.inventory.append("治療藥水")
+        assert worker.submit(p, w, n) == "delta"
+        # 快照在提交時已複製，之後的修改不會混入已排入的紀錄
+        p.inventory.append("煙霧彈")
+        worker.flush()
+    finally:
+        worker.close()
+
+    records = read_records(path)
+    assert records[1]["player"]["inventory"] == ["治療藥水"]
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_failed_write_forces_checkpoint_and_is_reported(tmp_path, monkeypatch):
+    path = str(tmp_path / "save.jsonl")
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    worker = save_engine.AutosaveWorker(engine)
+    p, w, n = make_game()
+    try:
+        assert worker.submit(p, w, n) == "checkpoint"
+        assert worker.flush()
+
+        def disk_full(record):
+            raise OSError("磁碟已滿")
+
+        monkeypatch.setattr(engine, "append", disk_full)
+        p.hp = 10
+        assert worker.submit(p, w, n) == "delta"
+        assert not worker.flush()
+
+        monkeypatch.undo()
+        p.growth_points = 4
+        assert worker.submit(p, w, n) == "checkpoint"
+        assert worker.flush()
+    finally:
+        worker.close()
+
+    lp, lw, ln = player.Player(), world.World(), StubNarrator()
+    assert save_engine.SaveEngine(path, legacy_path=None).load_into(lp, lw, ln)
+    assert lp.hp == 10 and lp.growth_points == 4
+
+
+def test_runtime_skill_evolutions_survive_reload(tmp_path):
+    path = str(tmp_path / "save.jsonl")
+    engine = save_engine.SaveEngine(path, legacy_path=None)
+    p, w, n = make_game()
+    engine.save(p, w, n)
+    w.add_skill_definition("意識上傳", {"cost": 8, "description": "將意識上傳到網路。"})
+    w.add_skill_evolution("神經入侵", "意識上傳", 7)
+    assert engine.save(p, w, n) == "delta"
+
+    lp, lw, ln = player.Player(), world.World(), StubNarrator()
+    assert save_engine.SaveEngine(path, legacy_path=None).load_into(lp, lw, ln)
+    assert lw.skill_tree["神經入侵"] == {"next": "意識上傳", "cost": 7}
+    assert lw.skill_root("意識上傳") == "駭客術"
+    assert lw.skill_depth("意識上傳") == 3
@@ -0,0 +1,38 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import pytest
+
+from src import schemas
+
+
+def test_verdict_with_commas_in_reason():
+    reply = '```json\n{"valid": true, "needs_roll": true, "num_dice": 2, "target": 30, "reason": "守衛很警覺，而且天色還亮, 難度不低"}\n```'
+    data = schemas.parse(reply, schemas.VERDICT_SCHEMA)
+    assert schemas.verdict_tuple(data) == (True, "守衛很警覺，而且天色還亮, 難度不低", True, 2, 30)
+
+
+def test_invalid_replies_list_every_problem():
+    with pytest.raises(ValueError) as excinfo:
+        schemas.parse('{"valid": "是", "needs_roll": false, "num_dice": 9, "target": 0}', schemas.VERDICT_SCHEMA)
+    message = str(excinfo.value)
+    assert "$.valid 應為 boolean" in message
+    assert "$.num_dice 不可大於 5" in message
+    assert "$.reason 為必要欄位" in message
+    with pytest.raises(ValueError, match="不是有效的 JSON"):
+        schemas.parse("是,是,2,30,原因", schemas.VERDICT_SCHEMA)
+
+
+def test_narrative_tuple_matches_text_parser_layout():
+    data = schemas.parse("""{"narrative": " 你拾起短刃。 ", "growth_points": 2,
+        "faith": {"deity": "月神", "change": 3}, "faith_extra": 1,
+        "item": {"name": "月影短刃", "definition": {"type": "神器", "bonus": {"DEX": 2}}},
+        "skill": null}""", schemas.NARRATIVE_SCHEMA)
+    assert schemas.narrative_tuple(data) == (
+        "你拾起短刃。", 2, ("月神", 3), 0,
+        "月影短刃", {"type": "神器", "bonus": {"DEX": 2}}, None, None, None, None,
+    )
+    assert schemas.validate({"narrative": ""}, schemas.NARRATIVE_SCHEMA) == ["$.narrative 不可為空"]
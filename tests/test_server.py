@@ -0,0 +1,78 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import asyncio
+import types
+
+if "narrator" not in sys.modules:
+    fake = types.ModuleType("narrator")
+    fake.Narrator = object
+    sys.modules["narrator"] = fake
+
+from src import server
+
+
+class StubNarrator:
+    def evaluate_action(self, action, p, w):
+        return True, "", False, 0, 0
+
+    def get_no_roll_outcome(self, action, p, w, on_text=None):
+        return f"{p.name}：{action}", 1, None, 0, None, None, None, None, None, None
+
+
+async def read_until(reader, marker):
+    data = b""
+    while marker.encode("utf-8") not in data:
+        data += await asyncio.wait_for(reader.read(4096), timeout=2)
+    return data.decode("utf-8")
+
+
+def test_sessions_are_independent():
+    async def run():
+        game_server = server.GameServer(port=0, max_inflight=2, narrator_factory=StubNarrator)
+        await game_server.start()
+        clients = []
+        try:
+            for name in ["阿明", "小華"]:
+                reader, writer = await asyncio.open_connection(game_server.host, game_server.port)
+                await read_until(reader, "名字")
+                writer.write(f"{name}\n".encode("utf-8"))
+                await read_until(reader, "種族")
+                writer.write("1\n".encode("utf-8"))
+                await read_until(reader, "> ")
+                clients.append((reader, writer))
+
+            # 以不經過本地判定的動作觸發敘事者
+            outputs = []
+            for reader, writer in clients:
+                writer.write("仔細研究牆上的古老塗鴉有什麼含意\n".encode("utf-8"))
+            for reader, writer in clients:
+                outputs.append(await read_until(reader, "> "))
+            assert "阿明：仔細研究" in outputs[0]
+            assert "小華：仔細研究" in outputs[1]
+            assert "1 點成長點數" in outputs[0]
+            assert len(game_server.sessions) == 2
+        finally:
+            for _, writer in clients:
+                writer.close()
+            await game_server.close()
+
+    asyncio.run(run())
+
+
+def test_close_restores_stdout():
+    original = sys.stdout
+
+    async def run():
+        first = server.GameServer(port=0, narrator_factory=StubNarrator)
+        second = server.GameServer(port=0, narrator_factory=StubNarrator)
+        await first.close()
+        # 另一個伺服器仍在使用時保留代理
+        assert sys.stdout is not original
+        await second.close()
+
+    asyncio.run(run())
+    assert sys.stdout is original
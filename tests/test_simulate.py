@@ -0,0 +1,63 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import types
+
+if "narrator" not in sys.modules:
+    fake = types.ModuleType("narrator")
+    fake.Narrator = object
+    sys.modules["narrator"] = fake
+
+from src import simulate
+
+
+def test_headless_sessions_report_metrics(tmp_path):
+    report = simulate.simulate(sessions=2, turns=30, seed=3, save_dir=str(tmp_path))
+    assert report["turns"] == 60
+    assert report["p50_ms"] <= report["p99_ms"]
+    assert report["turns_per_sec"] > 0 and report["peak_memory_kb"] > 0
+    assert sorted(os.listdir(tmp_path)) == ["session_0.jsonl", "session_1.jsonl"]
+
+
+def test_latency_is_measured_without_tracemalloc(tmp_path, monkeypatch):
+    import tracemalloc
+    tracing = []
+    run_session = simulate.run_session
+
+    def record(*args, **kwargs):
+        tracing.append(tracemalloc.is_tracing())
+        return run_session(*args, **kwargs)
+
+    monkeypatch.setattr(simulate, "run_session", record)
+    report = simulate.simulate(sessions=1, turns=5, save_dir=str(tmp_path))
+    # 第一輪量測延遲，第二輪才開啟 tracemalloc 量測記憶體
+    assert tracing == [False, True]
+    assert report["peak_memory_kb"] > 0
+    assert not tracemalloc.is_tracing()
+
+    tracing.clear()
+    assert simulate.simulate(sessions=1, turns=5, measure_memory=False)["peak_memory_kb"] == 0
+    assert tracing == [False]
+
+
+def test_scripted_session_is_deterministic_and_survives_reloads(tmp_path):
+    script = ["往前走", "成長", "試著撬開上鎖的鐵門", "使用 戰鬥興奮劑"]
+    saves = []
+    for name in ["a.jsonl", "b.jsonl"]:
+        path = str(tmp_path / name)
+        assert len(simulate.run_session(12, seed=5, script=script, save_path=path, reload_every=4)) == 12
+        with open(path, encoding='utf-8') as f:
+            saves.append(f.read())
+    assert saves[0] == saves[1]
+
+
+def test_scripted_input_exits_menus_when_script_runs_out():
+    from src import player, world
+    p = player.Player()
+    p.growth_points = 100
+    with simulate.scripted_input(["1", "STR", "是"]):
+        p.manage_growth(world.World())
+    assert p.attributes["STR"] == 11
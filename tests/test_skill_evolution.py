@@ -27,4 +27,27 @@ def test_evolve_skill_insufficient_gp():
     assert p.skills == ["火球術"]
 
 
+def test_skill_index_roots_and_depths():
+    w = world.World()
+    assert w.skill_root("神經入侵") == "駭客術"
+    assert w.skill_ancestors("神經入侵") == ["資料探勘", "駭客術"]
+    assert w.skill_depth("駭客術") == 0
+    assert w.skill_depth("流星焚界") == 2
+
+    w.add_skill_evolution("神經入侵", "意識上傳", 8)
+    assert w.skill_root("意識上傳") == "駭客術"
+    assert w.skill_depth("意識上傳") == 3
+    # 不允許造成循環
+    w.add_skill_evolution("意識上傳", "駭客術", 1)
+    assert "意識上傳" not in w.skill_tree
+
 
+def test_learnable_skills_exclude_owned_chains(monkeypatch, capsys):
+    w = world.World()
+    p = player.Player()
+    p.skills = ["資料探勘"]
+    monkeypatch.setattr("builtins.input", lambda prompt="": "返回")
+    p.learn_new_skill(w)
+    listing = capsys.readouterr().out
+    assert "駭客術" not in listing
+    assert "火球術" in listing
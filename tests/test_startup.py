@@ -0,0 +1,45 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import json
+import subprocess
+
+# 匯入 main（到第一個提示之前需要的所有模組）的時間上限，單位為秒
+IMPORT_BUDGET = 0.5
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+
+import narrator
+n = narrator.Narrator()
+n.restore_history([{"role": "user", "parts": ["嗨"]}, {"role": "model", "parts": ["你好"]}])
+n._remember("看看四周", "一片寂靜")
+print(json.dumps({
+    "elapsed": elapsed,
+    "heavy": [name for name in ("google.generativeai", "asyncio") if name in sys.modules],
+    "history": len(n.chat.history),
+    "last_scene": n.last_scene,
+}))
+"""
+
+
+def test_startup_defers_sdk_and_stays_within_budget():
+    env = dict(os.environ, GEMINI_API_KEY="test-key")
+    # 取最快的一次，避免偶發的系統負載造成誤判
+    reports = []
+    for _ in range(3):
+        output = subprocess.run([sys.executable, "-c", _PROBE], cwd=os.path.join(base_dir, "src"),
+                                env=env, capture_output=True, text=True, check=True).stdout
+        reports.append(json.loads(output.strip().splitlines()[-1]))
+    report = min(reports, key=lambda r: r["elapsed"])
+    assert report["elapsed"] < IMPORT_BUDGET
+    # 建立敘事者、恢復歷史與記錄快取命中都不需要 SDK
+    assert report["heavy"] == []
+    assert report["history"] == 4
+    assert report["last_scene"] == "你好"
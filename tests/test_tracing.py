@@ -0,0 +1,60 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import json
+import types
+
+if "narrator" not in sys.modules:
+    fake = types.ModuleType("narrator")
+    fake.Narrator = object
+    sys.modules["narrator"] = fake
+
+from src import game, player, simulate, tracing, world
+
+
+def test_disabled_tracer_returns_noop_span():
+    tracer = tracing.Tracer()
+    with tracer.span("turn") as span:
+        span.set(size=1)
+    assert tracer.stats == {}
+
+
+def test_turn_spans_nest_and_export_to_jsonl(tmp_path, monkeypatch):
+    tracer = game.tracing.Tracer()
+    path = tmp_path / "trace.jsonl"
+    tracer.configure(jsonl_path=str(path))
+    # game 以頂層模組名稱匯入 tracing
+    monkeypatch.setattr(game.tracing, "TRACER", tracer)
+
+    n = simulate.OfflineNarrator(seed=2)
+    with game.tracing.span("turn"):
+        game.handle_action("仔細研究牆上的古老塗鴉有什麼含意", player.Player(), world.World(), n)
+    tracer.shutdown()
+
+    spans = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    by_name = {s["name"]: s for s in spans}
+    turn = by_name["turn"]
+    assert turn["parent_id"] is None
+    assert by_name["classify"]["parent_id"] == turn["span_id"]
+    assert by_name["classify"]["attributes"] == {"local": False}
+    assert {s["trace_id"] for s in spans} == {turn["trace_id"]}
+    assert {"judge", "narrate"} <= set(by_name)
+    assert "narrate" in tracer.report()
+
+
+def test_exchange_sizes_and_otlp_payload():
+    tracer = tracing.Tracer()
+    tracer.configure()
+    with tracer.span("narrator.send") as span:
+        tracing.record_exchange(span, "你好", "abcdefgh")
+    assert span.attributes == {"prompt_chars": 2, "response_chars": 8, "prompt_tokens": 2, "response_tokens": 2}
+
+    exporter = tracing.OtlpExporter("http://localhost:4318/")
+    payload = exporter._payload([span])
+    otlp_span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert exporter.url == "http://localhost:4318/v1/traces"
+    assert otlp_span["traceId"] == span.trace_id and len(otlp_span["traceId"]) == 32
+    assert {"key": "prompt_chars", "value": {"intValue": "2"}} in otlp_span["attributes"]
@@ -0,0 +1,53 @@
+import os
+import sys
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, 'src'))
+
+import pytest
+from src import world
+
+
+def test_worlds_share_builtin_catalog():
+    w1, w2 = world.World(), world.World()
+    assert w1.items.maps[-1] is w2.items.maps[-1]
+    assert w1.races is w2.races
+    assert w1.items.maps[0] == {} and w1.skills.maps[0] == {} and w1.miracles.maps[0] == {}
+
+
+def test_builtin_definitions_are_read_only():
+    w = world.World()
+    with pytest.raises(TypeError):
+        w.items["治療藥水"]["effect"]["heal"] = 999
+    with pytest.raises(TypeError):
+        world.catalog.current().items["新物品"] = {}
+    with pytest.raises(AttributeError):
+        w.races["人類"]["skills"].append("駭客術")
+
+
+def test_created_definitions_stay_in_session_overlay():
+    w1, w2 = world.World(), world.World()
+    w1.add_item_definition("月影短刃", {"type": "武器", "slot": "weapon", "bonus": {"DEX": 2}})
+    w1.add_skill_definition("意識上傳", {"cost": 8, "description": "將意識上傳到網路。"})
+    w1.add_skill_evolution("神經入侵", "意識上傳", 7)
+
+    assert set(w1.items.maps[0]) == {"月影短刃"}
+    assert "月影短刃" in w1.items and "治療藥水" in w1.items
+    assert "月影短刃" not in w2.items
+    assert "神經入侵" not in w2.skill_tree
+    assert w1.skill_root("意識上傳") == "駭客術"
+    assert w2.skill_ancestors("意識上傳") == []
+    assert w1.created_definitions() == {
+        "items": {"月影短刃": {"type": "武器", "slot": "weapon", "bonus": {"DEX": 2}}},
+        "skills": {"意識上傳": {"cost": 8, "description": "將意識上傳到網路。"}},
+        "miracles": {},
+        "skill_tree": {"神經入侵": {"next": "意識上傳", "cost": 7}},
+    }
+
+
+def test_restore_definitions_records_each_name_once():
+    w = world.World()
+    definitions = {"items": {"月影短刃": {"type": "武器", "slot": "weapon"}}}
+    w.restore_definitions(definitions)
+    w.restore_definitions(definitions)
+    assert w.created["items"] == ["月影短刃"]